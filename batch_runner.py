@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+
+"""
+Simulações em lote (sem interface) do Woodblock Puzzle
+------------------------------------------------------
+Joga N partidas completas com um ou mais algoritmos de IA, sem janela nem
+atrasos entre movimentos, e apresenta estatísticas de cada algoritmo:
+distribuição da pontuação final, movimentos por partida, nós explorados,
+profundidade máxima e tempo por decisão.
+
+Cada decisão da IA tem o mesmo limite para todos os algoritmos:
+--time-per-move segundos e/ou --node-budget nós. Com prazo, o resultado
+depende da velocidade da máquina; para partidas reproduzíveis use
+--time-per-move 0. Sem --node-budget, cada algoritmo usa o seu orçamento
+de nós por omissão; o dfs também pára ao fim de 1 s, por isso só é
+reproduzível com --node-budget.
+
+Com --workers N as partidas são distribuídas por N processos (uma partida
+usa um único núcleo). Cada partida depende só da sua seed, e os resultados
+são ordenados por seed antes de agregados, por isso (com partidas
+reproduzíveis) o resumo é o mesmo qualquer que seja o número de processos.
+
+Com --log-states cada partida guardada em --output leva também a trajetória
+(ocupação e pontuação depois de cada jogada): são os dados de treino da
+função de valor aprendida (train_value_model.py).
+
+--weights lê de um ficheiro JSON os pesos da heurística do algoritmo (por
+exemplo, os encontrados por tune_weights.py); os pesos em falta ficam com
+os valores originais.
+
+Exemplo:
+    python3 batch_runner.py -a greedy astar -n 50 --size 10 --difficulty easy --seed 1
+    python3 batch_runner.py -a greedy -n 10000 --workers 16
+    python3 batch_runner.py -a mcts dfs -n 20 --time-per-move 0 --node-budget 2000
+    python3 batch_runner.py -a cascade -n 200 --time-per-move 0 --weights pesos_cascade.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+from woodblock_puzzle import AI_ALGORITHMS, SEARCHERS, AIPlayer, HeuristicWeights
+
+# Número de chamadas seguidas a make_ai_move sem colocar peça a partir do qual
+# a partida é dada como bloqueada (evita ciclos infinitos em simulação). Os
+# passos do plano são confirmados antes de jogados, por isso cada chamada
+# normalmente coloca uma peça; isto só protege contra erros da busca.
+MAX_STALLED_CALLS = 200
+
+
+def play_game(algorithm, board_size, difficulty, seed, max_moves=None, beam_width=1, search_workers=1,
+              time_per_move=0.5, node_budget=None, weights=None, log_states=False):
+    """
+    Joga uma partida completa com o algoritmo dado e devolve um dicionário
+    com os resultados. A mesma seed gera sempre o mesmo tabuleiro inicial e
+    a mesma sequência de peças, e sem prazo (time_per_move=None ou 0) as
+    decisões da IA são reproduzíveis (no dfs, só com node_budget). 'weights'
+    são os pesos da heurística (dicionário; None = os originais). Com
+    log_states o resultado inclui a trajetória: [ocupação, pontuação] no
+    início e depois de cada jogada.
+    """
+    player = AIPlayer(board_size, difficulty, algorithm, seed=seed, beam_width=beam_width,
+                      search_workers=search_workers, time_per_move=time_per_move, node_budget=node_budget,
+                      weights=weights)
+
+    start_time = time.perf_counter()
+    stalled_calls = 0
+    trajectory = [[player.board.occupancy, player.board.score]] if log_states else None
+    while not player.game_over:
+        if max_moves is not None and player.moves_made >= max_moves:
+            break
+        moves_before = player.moves_made
+        player.make_ai_move()
+        stalled_calls = stalled_calls + 1 if player.moves_made == moves_before else 0
+        if log_states and player.moves_made != moves_before:
+            trajectory.append([player.board.occupancy, player.board.score])
+        if stalled_calls >= MAX_STALLED_CALLS:
+            break
+
+    if player.game_over:
+        status = "game_over"
+    elif stalled_calls >= MAX_STALLED_CALLS:
+        status = "stalled"
+    else:
+        status = "max_moves"
+
+    result = {
+        "algorithm": algorithm,
+        "board_size": board_size,
+        "difficulty": difficulty,
+        "seed": seed,
+        "beam_width": beam_width,
+        "time_per_move": time_per_move,
+        "node_budget": node_budget,
+        "weights": player.weights,
+        "status": status,
+        "score": player.board.score,
+        "moves": player.moves_made,
+        "nodes_explored": player.total_nodes_explored,
+        "nodes_pruned": player.total_nodes_pruned,
+        "max_depth": player.max_depth_reached,
+        "decisions": len(player.decision_times),
+        "plan_breaks": player.plan_breaks,
+        "discarded_steps": player.discarded_steps,
+        "max_frontier": player.max_frontier,
+        "memory_limited_decisions": player.memory_limited_decisions,
+        "decision_times": player.decision_times,
+        "wall_time": time.perf_counter() - start_time,
+    }
+    if log_states:
+        result["trajectory"] = trajectory
+    return result
+
+
+def _play_game_task(task):
+    """ Ponto de entrada dos processos do pool (tem de ser uma função de módulo). """
+    return play_game(*task)
+
+
+def play_games(algorithm, board_size, difficulty, seeds, max_moves=None, workers=1, on_result=None, beam_width=1,
+               search_workers=1, time_per_move=0.5, node_budget=None, weights=None, log_states=False):
+    """
+    Joga uma partida por seed e devolve os resultados ordenados por seed.
+
+    Com workers > 1 as seeds são repartidas por um pool de processos; cada
+    resultado é passado a on_result assim que a partida termina (por ordem
+    de conclusão), mas a lista devolvida é sempre ordenada por seed.
+    """
+    tasks = [(algorithm, board_size, difficulty, seed, max_moves, beam_width, search_workers, time_per_move, node_budget,
+              weights, log_states) for seed in seeds]
+    results = []
+    if workers <= 1:
+        for task in tasks:
+            result = _play_game_task(task)
+            results.append(result)
+            if on_result:
+                on_result(result)
+    else:
+        # Lotes pequenos: equilibram a carga (as partidas têm durações muito diferentes)
+        # sem pagar a comunicação entre processos a cada partida
+        chunksize = max(1, min(16, len(tasks) // (workers * 8)))
+        with multiprocessing.Pool(processes=workers) as pool:
+            for result in pool.imap_unordered(_play_game_task, tasks, chunksize=chunksize):
+                results.append(result)
+                if on_result:
+                    on_result(result)
+    results.sort(key=lambda r: r["seed"])
+    return results
+
+
+def summarize(results):
+    """ Agrega os resultados de várias partidas de um mesmo algoritmo. """
+    scores = np.array([r["score"] for r in results], dtype=float)
+    moves = np.array([r["moves"] for r in results], dtype=float)
+    nodes = np.array([r["nodes_explored"] for r in results], dtype=float)
+    pruned = np.array([r["nodes_pruned"] for r in results], dtype=float)
+    depths = np.array([r["max_depth"] for r in results], dtype=float)
+    times = np.array([t for r in results for t in r["decision_times"]], dtype=float)
+    num_decisions = sum(r["decisions"] for r in results)
+    plan_breaks = sum(r["plan_breaks"] for r in results)
+    discarded_steps = sum(r["discarded_steps"] for r in results)
+    frontiers = np.array([r["max_frontier"] for r in results], dtype=float)
+    statuses = {}
+    for r in results:
+        statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+
+    def percentiles(values):
+        if len(values) == 0:
+            return {"mean": 0.0, "std": 0.0, "min": 0.0, "p10": 0.0, "median": 0.0, "p90": 0.0, "max": 0.0}
+        return {
+            "mean": float(values.mean()),
+            "std": float(values.std()),
+            "min": float(values.min()),
+            "p10": float(np.percentile(values, 10)),
+            "median": float(np.median(values)),
+            "p90": float(np.percentile(values, 90)),
+            "max": float(values.max()),
+        }
+
+    return {
+        "games": len(results),
+        "statuses": statuses,
+        "score": percentiles(scores),
+        "moves": percentiles(moves),
+        "nodes_per_game": float(nodes.mean()) if len(nodes) else 0.0,
+        "nodes_per_decision": float(nodes.sum() / num_decisions) if num_decisions else 0.0,
+        "pruned_per_game": float(pruned.mean()) if len(pruned) else 0.0,
+        "pruned_per_decision": float(pruned.sum() / num_decisions) if num_decisions else 0.0,
+        "max_depth": percentiles(depths),
+        "decisions": num_decisions,
+        "plan_breaks": plan_breaks,
+        "discarded_steps": discarded_steps,
+        "max_frontier": percentiles(frontiers),
+        "memory_limited_decisions": sum(r["memory_limited_decisions"] for r in results),
+        "decision_time": {
+            "mean": float(times.mean()) if len(times) else 0.0,
+            "median": float(np.median(times)) if len(times) else 0.0,
+            "p95": float(np.percentile(times, 95)) if len(times) else 0.0,
+            "max": float(times.max()) if len(times) else 0.0,
+        },
+    }
+
+
+def format_summary(algorithm, summary):
+    """ Formata o resumo de um algoritmo para o terminal. """
+    score = summary["score"]
+    moves = summary["moves"]
+    dt = summary["decision_time"]
+    statuses = ", ".join(f"{name}={count}" for name, count in sorted(summary["statuses"].items()))
+    lines = [
+        f"== {algorithm} ({summary['games']} partidas: {statuses})",
+        f"  Pontuação  média {score['mean']:.1f} ± {score['std']:.1f} | min {score['min']:.0f}"
+        f" | p10 {score['p10']:.0f} | mediana {score['median']:.0f} | p90 {score['p90']:.0f} | max {score['max']:.0f}",
+        f"  Movimentos média {moves['mean']:.1f} | min {moves['min']:.0f} | mediana {moves['median']:.0f} | max {moves['max']:.0f}",
+        f"  Nós explorados {summary['nodes_per_game']:.0f} por partida | {summary['nodes_per_decision']:.1f} por decisão",
+        f"  Nós cortados {summary['pruned_per_game']:.0f} por partida | {summary['pruned_per_decision']:.1f} por decisão",
+        f"  Profundidade máx. média {summary['max_depth']['mean']:.1f} | max {summary['max_depth']['max']:.0f}",
+        f"  Planos interrompidos {summary['plan_breaks']} ({summary['discarded_steps']} passos descartados)",
+        f"  Tempo por decisão ({summary['decisions']} decisões) média {dt['mean'] * 1000:.2f} ms"
+        f" | mediana {dt['median'] * 1000:.2f} ms | p95 {dt['p95'] * 1000:.2f} ms | max {dt['max'] * 1000:.2f} ms",
+    ]
+    if summary["max_frontier"]["max"]: # Só a BFS guarda fronteiras
+        lines.append(f"  Maior fronteira por partida média {summary['max_frontier']['mean']:.0f}"
+                     f" | max {summary['max_frontier']['max']:.0f} estados"
+                     f" | {summary['memory_limited_decisions']} decisões no limite de memória")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulações em lote (sem interface) dos algoritmos de IA.")
+    parser.add_argument("-a", "--algorithm", nargs="+", choices=AI_ALGORITHMS, default=["greedy"],
+                        help="algoritmo(s) a avaliar")
+    parser.add_argument("-n", "--games", type=int, default=10, help="número de partidas por algoritmo")
+    parser.add_argument("--size", type=int, choices=[5, 10], default=5, help="tamanho do tabuleiro")
+    parser.add_argument("--difficulty", choices=["easy", "medium", "hard"], default="medium", help="dificuldade")
+    parser.add_argument("--seed", type=int, default=0, help="seed da primeira partida (a partida i usa seed + i)")
+    parser.add_argument("--max-moves", type=int, default=None, help="limite de movimentos por partida")
+    parser.add_argument("--beam-width", type=int, default=1,
+                        help="largura do feixe de greedy, dynamic_stability, cascade e learned (1 = guloso)")
+    parser.add_argument("--time-per-move", type=float, default=0.5,
+                        help="segundos por decisão, iguais para todos os algoritmos (0 = sem prazo)")
+    parser.add_argument("--node-budget", type=int, default=None,
+                        help="nós por decisão, na unidade de cada algoritmo (sem prazo nem orçamento, "
+                             "cada algoritmo usa os seus limites por omissão)")
+    parser.add_argument("--weights", default=None,
+                        help="ficheiro JSON com os pesos da heurística (p.ex. o --output de tune_weights.py)")
+    parser.add_argument("--output", default=None, help="ficheiro JSON Lines onde guardar o resultado de cada partida")
+    parser.add_argument("--log-states", action="store_true",
+                        help="guardar em --output a trajetória de cada partida (treino de train_value_model.py)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="número de processos (0 = um por núcleo)")
+    parser.add_argument("--search-workers", type=int, default=1,
+                        help="processos usados pela busca de cada decisão (ParallelSearch); "
+                             "não pode ser combinado com --workers")
+    parser.add_argument("--progress", action="store_true", help="mostrar o progresso no stderr")
+    args = parser.parse_args(argv)
+    # Os processos do pool de partidas não podem criar os seus próprios pools
+    if args.workers != 1 and args.search_workers > 1:
+        parser.error("--search-workers só pode ser usado com --workers 1")
+    if args.log_states and not args.output:
+        parser.error("--log-states precisa de --output")
+    if args.weights is not None:
+        if len(args.algorithm) != 1:
+            parser.error("--weights só pode ser usado com um único algoritmo")
+        with open(args.weights) as f:
+            args.weights = json.load(f)
+        try:
+            HeuristicWeights(SEARCHERS[args.algorithm[0]].DEFAULT_WEIGHTS, args.weights)
+        except ValueError as e:
+            parser.error(str(e))
+    if "learned" in args.algorithm:
+        # Sem modelo, todas as partidas acabariam sem nenhuma jogada
+        try:
+            SEARCHERS["learned"]().model_for(args.size)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workers = args.workers if args.workers > 0 else os.cpu_count() or 1
+    seeds = range(args.seed, args.seed + args.games)
+    output = open(args.output, "w") if args.output else None
+    try:
+        for algorithm in args.algorithm:
+            finished = [0]
+
+            def report(result):
+                finished[0] += 1
+                if args.progress:
+                    print(f"[{algorithm}] {finished[0]}/{args.games} seed={result['seed']} "
+                          f"pontuação={result['score']}", file=sys.stderr)
+
+            results = play_games(algorithm, args.size, args.difficulty, seeds,
+                                 args.max_moves, workers, on_result=report, beam_width=args.beam_width,
+                                 search_workers=args.search_workers, time_per_move=args.time_per_move,
+                                 node_budget=args.node_budget, weights=args.weights, log_states=args.log_states)
+            if output:
+                for result in results:
+                    output.write(json.dumps(result) + "\n")
+            print(format_summary(algorithm, summarize(results)))
+    finally:
+        if output:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Os kernels vetorizados das heurísticas de estabilidade e de cascata têm de dar
+exatamente (bit a bit) os valores dos avaliadores originais, célula a célula,
+que estão aqui como referência. A afinação dos pesos e as buscas reproduzíveis
+dependem desta igualdade.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from woodblock_puzzle import Board, CascadeSearch, DynamicStabilitySearch, GameState
+
+
+def reference_stability(board):
+    stability_score = 0; grid = board.grid; size = board.size
+    for r in range(size):
+        for c in range(size):
+            if grid[r,c]==1:
+                n=0
+                if r>0 and grid[r-1,c]==1: n+=1
+                if r<size-1 and grid[r+1,c]==1: n+=1
+                if c>0 and grid[r,c-1]==1: n+=1
+                if c<size-1 and grid[r,c+1]==1: n+=1
+                stability_score += n*5
+    q_size = max(1,size//2); q_counts=[0]*4
+    for r in range(q_size):
+        for c in range(q_size):
+            if r<size and c<size and grid[r,c]==1: q_counts[0]+=1
+        for c in range(q_size, size):
+            if r<size and c<size and grid[r,c]==1: q_counts[1]+=1
+    for r in range(q_size, size):
+        for c in range(q_size):
+            if r<size and c<size and grid[r,c]==1: q_counts[2]+=1
+        for c in range(q_size, size):
+            if r<size and c<size and grid[r,c]==1: q_counts[3]+=1
+    if sum(q_counts) == 0: return stability_score
+    avg_b = sum(q_counts) / 4.0; variance = sum((ct-avg_b)**2 for ct in q_counts)/4.0
+    stability_score -= variance*2
+    return stability_score
+
+
+def reference_stability_child(state, next_state):
+    score_gain = next_state.score - state.score
+    stability = reference_stability(next_state.board); board = next_state.board; potential = 0
+    for i in range(board.size):
+        r_fill = sum(board.grid[i,:]); c_fill = sum(board.grid[:,i])
+        potential += (r_fill/board.size)**2*100 + (c_fill/board.size)**2*100
+    empty = np.sum(board.grid==0); space = empty*3
+    return score_gain*2 + stability*1.5 + potential + space
+
+
+def reference_cascade(board):
+    cascade_score = 0; grid = board.grid; size = board.size
+    near_comp_thresh = 0.7
+    for i in range(size):
+        r_fill = sum(grid[i,:]); c_fill = sum(grid[:,i])
+        r_pct = r_fill/size; c_pct = c_fill/size
+        if r_pct >= near_comp_thresh and r_pct < 1.0: cascade_score += (r_pct**3)*200
+        if c_pct >= near_comp_thresh and c_pct < 1.0: cascade_score += (c_pct**3)*200
+    for r in range(size-1):
+        for c in range(size-1):
+            if grid[r,c]==1 and grid[r+1,c+1]==1: cascade_score += 10
+            if r>0 and c<size-1 and grid[r,c+1]==1 and grid[r-1,c]==1: cascade_score += 10
+    visited = set()
+    def count_group_size(r,c):
+        if not (0<=r<size and 0<=c<size) or (r,c) in visited or grid[r,c]==0: return 0
+        visited.add((r,c)); size_count=1
+        size_count += count_group_size(r-1,c); size_count += count_group_size(r+1,c)
+        size_count += count_group_size(r,c-1); size_count += count_group_size(r,c+1)
+        return size_count
+    for r in range(size):
+        for c in range(size):
+            if grid[r,c]==1 and (r,c) not in visited:
+                group_size = count_group_size(r,c); cascade_score += group_size**1.5
+    return cascade_score
+
+
+def reference_cascade_child(state, next_state):
+    score_gain = next_state.score - state.score
+    cascade_potential = reference_cascade(next_state.board)
+    elim_bonus = score_gain * 2 if score_gain > 0 else 0
+    board = next_state.board; empty = np.sum(board.grid==0); space = empty*2
+    return score_gain*3 + cascade_potential*2 + elim_bonus + space
+
+
+def random_boards(size, count, seed):
+    """ Tabuleiros com ocupações de densidades variadas (vazios e cheios incluídos). """
+    rng = random.Random(seed); full = (1 << size * size) - 1
+    occupancies = [0, full]
+    while len(occupancies) < count:
+        occupancy = rng.getrandbits(size * size)
+        for _ in range(rng.randrange(3)):
+            occupancy = occupancy & rng.getrandbits(size * size) if rng.random() < 0.5 else occupancy | rng.getrandbits(size * size)
+        occupancies.append(occupancy & full)
+    boards = []
+    for occupancy in occupancies:
+        board = Board(size, "medium", rng=random.Random(seed)); board.occupancy = occupancy
+        boards.append(board)
+    return boards
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 10])
+def test_board_evaluators_match_reference(size):
+    stability = DynamicStabilitySearch(); cascade = CascadeSearch()
+    for board in random_boards(size, 80, seed=size):
+        assert stability.evaluate_stability(board) == reference_stability(board)
+        assert cascade.evaluate_cascade_potential(board) == reference_cascade(board)
+
+
+@pytest.mark.parametrize("size", [5, 10])
+def test_child_values_match_reference(size):
+    stability = DynamicStabilitySearch(); cascade = CascadeSearch()
+    for i, board in enumerate(random_boards(size, 60, seed=100 + size)):
+        parent_board = board.copy()
+        parent = GameState(parent_board, parent_board.available_pieces, score=1000)
+        child = GameState(board, board.available_pieces, score=1000 + (i % 4) * 150)
+        assert stability.evaluate_child(parent, child) == reference_stability_child(parent, child)
+        assert cascade.evaluate_child(parent, child) == reference_cascade_child(parent, child)
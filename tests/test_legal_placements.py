@@ -0,0 +1,44 @@
+"""
+O cache incremental de jogadas legais do Board (atualizado em place_piece e
+clear_lines) tem de dar sempre as mesmas posições que verificar cada posição
+de raiz com can_place_piece.
+"""
+
+import random
+
+import pytest
+
+from woodblock_puzzle import NUM_BASE_SHAPES, SHAPE_CATALOGUE, Board, Piece
+
+
+def full_scan(board, piece):
+    return [(row, col) for row in range(board.size) for col in range(board.size)
+            if board.can_place_piece(piece, row, col)]
+
+
+@pytest.mark.parametrize("size", [5, 10])
+@pytest.mark.parametrize("seed", range(6))
+def test_legal_cache_matches_full_scan(size, seed):
+    rng = random.Random(seed)
+    board = Board(size, "medium", rng=random.Random(seed))
+    probes = [Piece(SHAPE_CATALOGUE[shape_id], rng=rng) for shape_id in range(NUM_BASE_SHAPES)]
+    for _ in range(60):
+        # As peças de teste ficam no cache desde o início: são atualizadas jogada a jogada
+        for piece in probes:
+            assert board.legal_placements(piece) == full_scan(board, piece)
+        assert board.has_legal_move() == any(full_scan(board, piece) for piece in board.available_pieces)
+        moves = [(slot, position) for slot, piece in enumerate(board.available_pieces)
+                 for position in board.legal_placements(piece)]
+        if not moves:
+            break
+        slot, (row, col) = rng.choice(moves)
+        assert board.place_piece(board.available_pieces[slot], row, col)
+        board.available_pieces[slot] = board.generate_new_piece()
+
+
+def test_legal_cache_follows_external_occupancy_changes():
+    board = Board(5, "medium", rng=random.Random(0))
+    piece = Piece(SHAPE_CATALOGUE[0], rng=random.Random(0))
+    board.legal_placements(piece)
+    board.occupancy = random.Random(1).getrandbits(25)
+    assert board.legal_placements(piece) == full_scan(board, piece)
@@ -0,0 +1,50 @@
+"""
+Avaliar todas as jogadas de um estado de uma vez (GameState.evaluate_actions)
+tem de dar o mesmo que aplicar cada ação com apply_action: as mesmas ações,
+pela mesma ordem, com a mesma ocupação, chave de Zobrist e pontuação, e os
+mesmos valores nas heurísticas das beam searches.
+"""
+
+import random
+
+import pytest
+
+from woodblock_puzzle import (Board, CascadeSearch, DynamicStabilitySearch, GameState, GreedySearch,
+                              get_line_masks)
+
+
+def seeded_state(size, difficulty, seed):
+    """ Estado a meio de uma partida aleatória, com alguns casos especiais conforme a seed. """
+    rng = random.Random(seed)
+    board = Board(size, difficulty, rng=random.Random(seed))
+    for _ in range(rng.randrange(8)):
+        moves = [(slot, position) for slot, piece in enumerate(board.available_pieces)
+                 for position in board.legal_placements(piece)]
+        if not moves:
+            break
+        slot, (row, col) = rng.choice(moves)
+        board.place_piece(board.available_pieces[slot], row, col)
+        board.available_pieces[slot] = board.generate_new_piece()
+    if seed % 7 == 0:
+        board.occupancy |= get_line_masks(size)[0][1] # Linha já completa antes da jogada
+    if seed % 5 == 0:
+        board.available_pieces[1] = board.available_pieces[0] # Peças repetidas
+    return GameState(board, board.available_pieces, score=board.score, rng=random.Random(seed))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_batch_matches_apply_action(seed):
+    state = seeded_state((5, 10)[seed % 2], ("easy", "medium", "hard")[seed % 3], seed)
+    batch = state.evaluate_actions()
+    actions = state.get_possible_actions()
+    assert batch.actions == actions
+    assert len(batch) == len(actions)
+    children = [state.apply_action(action) for action in actions]
+    for i, child in enumerate(children):
+        assert child.board.occupancy == batch.occupancies[i]
+        assert child.board.zobrist == batch.zobrists[i]
+        assert child.score == batch.scores[i]
+    if children:
+        for searcher in (GreedySearch(), DynamicStabilitySearch(), CascadeSearch()):
+            assert list(searcher.evaluate_placements(state, batch)) == \
+                [searcher.evaluate_child(state, child) for child in children]
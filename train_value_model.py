@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""
+Treino da função de valor aprendida
+-----------------------------------
+Treina o modelo usado pelo algoritmo "learned" (LearnedEvaluator) a partir
+de partidas jogadas pela própria IA. As partidas são geradas com
+batch_runner.py --log-states, que guarda a ocupação e a pontuação depois de
+cada jogada.
+
+Cada tabuleiro da trajetória é um exemplo. As entradas são as features de
+board_features. O alvo são os pontos ganhos nas --horizon jogadas seguintes
+(até ao fim da partida, se vier antes). Nas partidas cortadas por
+--max-moves, os tabuleiros perto do corte não têm jogadas seguintes
+suficientes e ficam de fora.
+
+Modelos (--model):
+  linear  regressão linear (mínimos quadrados com regularização --l2)
+  mlp     rede com camadas escondidas ReLU (--hidden), treinada com Adam
+Os dois são guardados no mesmo formato .npz e avaliados só com NumPy.
+
+Uma parte das partidas (--validation) fica de fora do treino e serve para
+medir o erro. Fica guardado o modelo com menor erro nessas partidas.
+
+Exemplo:
+    python3 batch_runner.py -a greedy -n 2000 --workers 0 --time-per-move 0 --log-states --output partidas_5.jsonl
+    python3 train_value_model.py partidas_5.jsonl --model mlp --horizon 10 -o modelo_valor_5.npz
+    python3 batch_runner.py -a learned greedy -n 200 --time-per-move 0
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+import numpy as np
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+from woodblock_puzzle import BOARD_FEATURES, VALUE_MODEL_PATH, LearnedEvaluator, board_features
+
+
+def load_games(paths, size=None):
+    """
+    Trajetórias das partidas guardadas com --log-states. Sem 'size', usa o
+    tamanho da primeira partida; as partidas de outros tamanhos são ignoradas.
+    """
+    games = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                result = json.loads(line)
+                if "trajectory" not in result:
+                    continue
+                if size is None:
+                    size = result["board_size"]
+                if result["board_size"] == size:
+                    games.append(result)
+    return games, size
+
+
+def make_examples(games, size, horizon):
+    """ Features e alvos (pontos ganhos nas 'horizon' jogadas seguintes) de todas as partidas. """
+    occupancies = []; targets = []; game_ids = []
+    for game_id, game in enumerate(games):
+        trajectory = game["trajectory"]; last = len(trajectory) - 1
+        finished = game["status"] == "game_over"
+        for t, (occupancy, score) in enumerate(trajectory):
+            if t + horizon > last and not finished:
+                break # A partida foi cortada antes: os pontos seguintes não são conhecidos
+            occupancies.append(occupancy)
+            targets.append(trajectory[min(t + horizon, last)][1] - score)
+            game_ids.append(game_id)
+    if not occupancies:
+        return np.zeros((0, len(BOARD_FEATURES))), np.zeros(0), np.zeros(0, dtype=int)
+    return board_features(size, occupancies), np.array(targets, dtype=float), np.array(game_ids)
+
+
+def train_linear(x, y, l2):
+    """ Mínimos quadrados com regularização L2 (x e y já normalizados). """
+    w = np.linalg.solve(x.T @ x + l2 * len(x) * np.eye(x.shape[1]), x.T @ y)
+    return [(w.reshape(-1, 1), np.zeros(1))]
+
+
+def train_mlp(x, y, x_val, y_val, hidden, epochs, batch_size, learning_rate, l2, rng):
+    """
+    MLP com camadas ReLU e saída linear, erro quadrático médio, Adam. Devolve
+    as camadas da época com menor erro na validação (x, y já normalizados).
+    """
+    sizes = [x.shape[1]] + list(hidden) + [1]
+    layers = [(rng.standard_normal((n_in, n_out)) * np.sqrt(2.0 / n_in), np.zeros(n_out))
+              for n_in, n_out in zip(sizes[:-1], sizes[1:])]
+    moments = [[np.zeros_like(p) for p in layer] for layer in layers]
+    squares = [[np.zeros_like(p) for p in layer] for layer in layers]
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    best_layers = layers; best_error = float("inf"); step = 0
+
+    def forward(inputs, layers):
+        activations = [inputs]
+        for i, (w, b) in enumerate(layers):
+            output = activations[-1] @ w + b
+            activations.append(output if i == len(layers) - 1 else np.maximum(output, 0.0))
+        return activations
+
+    for epoch in range(epochs):
+        order = rng.permutation(len(x))
+        for start in range(0, len(x), batch_size):
+            batch = order[start:start + batch_size]
+            activations = forward(x[batch], layers)
+            gradient = (activations[-1].reshape(-1) - y[batch]).reshape(-1, 1) * (2.0 / len(batch))
+            step += 1
+            for i in reversed(range(len(layers))):
+                w, b = layers[i]
+                grads = (activations[i].T @ gradient + l2 * w, gradient.sum(axis=0))
+                if i > 0:
+                    gradient = (gradient @ w.T) * (activations[i] > 0)
+                updated = []
+                for j, (param, grad) in enumerate(zip(layers[i], grads)):
+                    moments[i][j] = beta1 * moments[i][j] + (1 - beta1) * grad
+                    squares[i][j] = beta2 * squares[i][j] + (1 - beta2) * grad ** 2
+                    m_hat = moments[i][j] / (1 - beta1 ** step); v_hat = squares[i][j] / (1 - beta2 ** step)
+                    updated.append(param - learning_rate * m_hat / (np.sqrt(v_hat) + epsilon))
+                layers[i] = tuple(updated)
+        error = float(np.mean((forward(x_val, layers)[-1].reshape(-1) - y_val) ** 2)) if len(x_val) else 0.0
+        if error < best_error:
+            best_error = error; best_layers = [tuple(p.copy() for p in layer) for layer in layers]
+    return best_layers
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Treino da função de valor aprendida (algoritmo learned).")
+    parser.add_argument("logs", nargs="+", help="ficheiros JSON Lines de batch_runner.py --log-states")
+    parser.add_argument("-o", "--output", default=None,
+                        help="ficheiro .npz do modelo (por omissão, o que o algoritmo learned lê para o tamanho)")
+    parser.add_argument("--size", type=int, default=None, help="tamanho do tabuleiro (por omissão, o da primeira partida)")
+    parser.add_argument("--model", choices=["linear", "mlp"], default="mlp", help="tipo de modelo")
+    parser.add_argument("--hidden", type=int, nargs="+", default=[32, 32], help="neurónios das camadas escondidas (mlp)")
+    parser.add_argument("--horizon", type=int, default=10, help="jogadas seguintes cujos pontos o modelo prevê")
+    parser.add_argument("--epochs", type=int, default=40, help="épocas de treino (mlp)")
+    parser.add_argument("--batch-size", type=int, default=256, help="exemplos por passo (mlp)")
+    parser.add_argument("--learning-rate", type=float, default=1e-3, help="taxa de aprendizagem do Adam (mlp)")
+    parser.add_argument("--l2", type=float, default=1e-4, help="regularização L2")
+    parser.add_argument("--validation", type=float, default=0.1, help="fração das partidas usada para validação")
+    parser.add_argument("--seed", type=int, default=0, help="seed da divisão treino/validação e da inicialização")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    games, size = load_games(args.logs, args.size)
+    if not games:
+        sys.exit("Não há partidas com trajetória (use batch_runner.py --log-states --output ...)")
+    features, targets, game_ids = make_examples(games, size, args.horizon)
+    if len(targets) == 0:
+        sys.exit("As partidas não têm jogadas suficientes para o horizonte pedido")
+
+    # Divisão por partidas: tabuleiros da mesma partida são muito parecidos
+    rng = np.random.default_rng(args.seed)
+    shuffled = list(range(len(games))); random.Random(args.seed).shuffle(shuffled)
+    validation_games = set(shuffled[:int(len(games) * args.validation)])
+    is_validation = np.array([game_id in validation_games for game_id in game_ids], dtype=bool)
+    train = ~is_validation
+
+    # Normalização com as estatísticas do treino (features constantes ficam com desvio 1)
+    feature_mean = features[train].mean(axis=0); feature_std = features[train].std(axis=0)
+    feature_std[feature_std < 1e-9] = 1.0
+    target_mean = float(targets[train].mean()); target_std = float(targets[train].std()) or 1.0
+    x = (features - feature_mean) / feature_std; y = (targets - target_mean) / target_std
+
+    if args.model == "linear":
+        layers = train_linear(x[train], y[train], args.l2)
+    else:
+        layers = train_mlp(x[train], y[train], x[is_validation], y[is_validation], args.hidden, args.epochs,
+                           args.batch_size, args.learning_rate, args.l2, rng)
+    model = LearnedEvaluator(size, layers, feature_mean, feature_std, target_mean, target_std, args.horizon)
+
+    print(f"== {args.model} {size}x{size}: {len(games)} partidas, {int(train.sum())} exemplos de treino, "
+          f"{int(is_validation.sum())} de validação (horizonte {args.horizon})")
+    for name, mask in (("treino", train), ("validação", is_validation)):
+        if not mask.any(): continue
+        error = model.forward(features[mask]) - targets[mask]
+        baseline = targets[mask] - target_mean # Prever sempre a média
+        r2 = 1 - np.mean(error ** 2) / max(np.mean(baseline ** 2), 1e-12)
+        print(f"  {name:9s} erro médio {np.mean(np.abs(error)):.1f} pontos | RMSE {np.sqrt(np.mean(error ** 2)):.1f}"
+              f" (prever a média: {np.sqrt(np.mean(baseline ** 2)):.1f}) | R² {r2:.3f}")
+
+    output = args.output or os.environ.get("WOODBLOCK_VALUE_MODEL", VALUE_MODEL_PATH).format(size=size)
+    model.save(output)
+    print(f"  Modelo guardado em {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
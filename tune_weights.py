@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+"""
+Afinação dos pesos das heurísticas
+----------------------------------
+Procura pesos melhores para a heurística de um algoritmo (DEFAULT_WEIGHTS da
+sua classe). Cada conjunto de pesos candidato joga as mesmas partidas sem
+interface: as mesmas seeds, logo os mesmos tabuleiros e as mesmas peças para
+todos os candidatos. Os candidatos são comparados pela pontuação média. As
+partidas de cada candidato são repartidas por --workers processos
+(batch_runner.play_games).
+
+Métodos (--method):
+  grid    todas as combinações dos fatores --factors aplicados aos pesos originais
+  random  cada candidato multiplica os pesos do melhor até agora por fatores
+          log-normais (desvio --sigma)
+O primeiro candidato são sempre os pesos originais, a referência da busca.
+
+Por omissão as decisões não têm prazo (--time-per-move 0), por isso a
+pontuação de um candidato não depende da carga da máquina e pode ser
+comparada entre corridas. A exceção é o dfs, que sem --node-budget também
+pára ao fim de 1 s por decisão.
+
+Depois de cada candidato o estado é guardado em --checkpoint (JSON). Para
+retomar, basta correr de novo o mesmo comando. Os candidatos são gerados de
+novo pela mesma ordem (mesma --search-seed), e os que já estão no checkpoint
+não voltam a ser jogados. Com um --candidates maior, uma busca já terminada
+continua a partir do ponto onde parou.
+
+Exemplo:
+    python3 tune_weights.py -a cascade --method random --candidates 200 -n 500 \\
+        --checkpoint afinar_cascade.json --output pesos_cascade.json
+    python3 tune_weights.py -a greedy --method grid --factors 0.5 1 2 --tune line gain -n 200
+    python3 batch_runner.py -a cascade -n 1000 --time-per-move 0 --weights pesos_cascade.json
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+from batch_runner import play_games, summarize
+from woodblock_puzzle import SEARCHERS
+
+# Algoritmos com pesos que podem ser afinados
+TUNABLE_ALGORITHMS = [name for name, searcher in SEARCHERS.items() if searcher.DEFAULT_WEIGHTS]
+
+# Parâmetros que definem uma busca: um checkpoint só pode ser retomado com os mesmos
+CONFIG_KEYS = ("algorithm", "size", "difficulty", "seed", "games", "max_moves", "beam_width",
+               "time_per_move", "node_budget", "method", "tune", "factors", "sigma", "search_seed")
+
+
+def clip_weight(algorithm, name, value):
+    """ Arredonda o peso (4 algarismos significativos) e mantém-no dentro dos limites da classe. """
+    value = float(f"{value:.4g}")
+    low, high = SEARCHERS[algorithm].WEIGHT_BOUNDS.get(name, (None, None))
+    if low is not None: value = max(low, value)
+    if high is not None: value = min(high, value)
+    return value
+
+
+def grid_candidates(algorithm, names, factors):
+    """ Pesos originais seguidos de todas as combinações dos fatores nos pesos 'names'. """
+    defaults = dict(SEARCHERS[algorithm].DEFAULT_WEIGHTS)
+    candidates = [defaults]
+    for combination in itertools.product(factors, repeat=len(names)):
+        weights = dict(defaults)
+        for name, factor in zip(names, combination):
+            weights[name] = clip_weight(algorithm, name, defaults[name] * factor)
+        if weights != defaults:
+            candidates.append(weights)
+    return candidates
+
+
+def random_candidate(rng, algorithm, incumbent, names, sigma):
+    """ Multiplica cada peso de 'names' por exp(N(0, sigma)); os outros ficam iguais. """
+    weights = dict(incumbent)
+    for name in names:
+        weights[name] = clip_weight(algorithm, name, incumbent[name] * math.exp(rng.gauss(0.0, sigma)))
+    return weights
+
+
+def evaluate_weights(config, weights, workers):
+    """ Joga as partidas da configuração com os pesos dados e resume o resultado. """
+    start_time = time.perf_counter()
+    seeds = range(config["seed"], config["seed"] + config["games"])
+    results = play_games(config["algorithm"], config["size"], config["difficulty"], seeds, config["max_moves"],
+                         workers, beam_width=config["beam_width"], time_per_move=config["time_per_move"],
+                         node_budget=config["node_budget"], weights=weights)
+    summary = summarize(results)
+    return {
+        "weights": weights,
+        "score": summary["score"]["mean"],
+        "score_std": summary["score"]["std"],
+        "moves": summary["moves"]["mean"],
+        "nodes_per_decision": summary["nodes_per_decision"],
+        "wall_time": time.perf_counter() - start_time,
+    }
+
+
+def load_checkpoint(path, config):
+    """ Candidatos já avaliados no checkpoint (lista vazia se ainda não existir). """
+    if path is None or not os.path.exists(path):
+        return []
+    with open(path) as f:
+        checkpoint = json.load(f)
+    different = [key for key in CONFIG_KEYS if checkpoint["config"].get(key) != config[key]]
+    if different:
+        sys.exit(f"O checkpoint {path} é de outra busca (difere em: {', '.join(different)})")
+    return checkpoint["candidates"]
+
+
+def save_checkpoint(path, config, candidates):
+    """ Grava o checkpoint num ficheiro temporário e substitui o anterior (nunca fica a meio). """
+    temporary = path + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump({"config": config, "candidates": candidates}, f, indent=1)
+    os.replace(temporary, path)
+
+
+def tune(config, num_candidates, workers=1, checkpoint=None, on_candidate=None):
+    """
+    Avalia até num_candidates conjuntos de pesos e devolve a lista dos
+    resultados (pela ordem em que foram gerados). Os candidatos que já estão
+    no checkpoint são reutilizados, desde que sejam os mesmos que a busca gera.
+    on_candidate(índice, resultado, melhor, reutilizado) é chamado para cada um.
+    """
+    algorithm = config["algorithm"]; names = config["tune"]
+    candidates = load_checkpoint(checkpoint, config)
+    rng = random.Random(config["search_seed"])
+    grid = grid_candidates(algorithm, names, config["factors"]) if config["method"] == "grid" else None
+    best = None
+    for index in range(num_candidates):
+        if grid is not None:
+            if index >= len(grid): break
+            weights = grid[index]
+        elif index == 0:
+            weights = dict(SEARCHERS[algorithm].DEFAULT_WEIGHTS)
+        else:
+            weights = random_candidate(rng, algorithm, best["weights"], names, config["sigma"])
+
+        reused = index < len(candidates)
+        if reused:
+            result = candidates[index]
+            if result["weights"] != weights:
+                sys.exit(f"O checkpoint {checkpoint} não corresponde a esta busca (candidato {index})")
+        else:
+            result = evaluate_weights(config, weights, workers)
+            candidates.append(result)
+            if checkpoint is not None:
+                save_checkpoint(checkpoint, config, candidates)
+        if best is None or result["score"] > best["score"]:
+            best = result
+        if on_candidate:
+            on_candidate(index, result, best, reused)
+    return candidates[:num_candidates]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Afinação dos pesos das heurísticas com partidas sem interface.")
+    parser.add_argument("-a", "--algorithm", choices=TUNABLE_ALGORITHMS, default="greedy", help="algoritmo a afinar")
+    parser.add_argument("--method", choices=["grid", "random"], default="random", help="método de busca dos pesos")
+    parser.add_argument("--tune", nargs="+", default=None,
+                        help="pesos a afinar (por omissão, todos os do algoritmo)")
+    parser.add_argument("--candidates", type=int, default=50, help="número de conjuntos de pesos a avaliar")
+    parser.add_argument("--factors", type=float, nargs="+", default=[0.5, 1.0, 2.0],
+                        help="fatores aplicados a cada peso (método grid)")
+    parser.add_argument("--sigma", type=float, default=0.3,
+                        help="desvio dos fatores log-normais (método random)")
+    parser.add_argument("--search-seed", type=int, default=0, help="seed do gerador dos candidatos")
+    parser.add_argument("-n", "--games", type=int, default=100, help="partidas por candidato")
+    parser.add_argument("--size", type=int, choices=[5, 10], default=5, help="tamanho do tabuleiro")
+    parser.add_argument("--difficulty", choices=["easy", "medium", "hard"], default="medium", help="dificuldade")
+    parser.add_argument("--seed", type=int, default=0, help="seed da primeira partida (a partida i usa seed + i)")
+    parser.add_argument("--max-moves", type=int, default=None, help="limite de movimentos por partida")
+    parser.add_argument("--beam-width", type=int, default=1,
+                        help="largura do feixe de greedy, dynamic_stability, cascade e learned (1 = guloso)")
+    parser.add_argument("--time-per-move", type=float, default=0,
+                        help="segundos por decisão (0 = sem prazo: pontuações reproduzíveis; no dfs, só com --node-budget)")
+    parser.add_argument("--node-budget", type=int, default=None, help="nós por decisão, na unidade do algoritmo")
+    parser.add_argument("--workers", type=int, default=0, help="número de processos (0 = um por núcleo)")
+    parser.add_argument("--checkpoint", default=None, help="ficheiro JSON onde guardar (e de onde retomar) a busca")
+    parser.add_argument("--output", default=None, help="ficheiro JSON onde guardar os melhores pesos")
+    args = parser.parse_args(argv)
+    defaults = SEARCHERS[args.algorithm].DEFAULT_WEIGHTS
+    if args.tune is None:
+        args.tune = list(defaults)
+    unknown = [name for name in args.tune if name not in defaults]
+    if unknown:
+        parser.error(f"pesos desconhecidos para {args.algorithm}: {', '.join(unknown)} "
+                     f"(conhecidos: {', '.join(defaults)})")
+    if args.algorithm == "learned":
+        try:
+            SEARCHERS["learned"]().model_for(args.size)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workers = args.workers if args.workers > 0 else os.cpu_count() or 1
+    config = {key: getattr(args, key) for key in CONFIG_KEYS}
+    # Só o parâmetro do método escolhido conta para retomar o checkpoint
+    if args.method == "grid": config["sigma"] = None
+    else: config["factors"] = None
+
+    def report(index, result, best, reused):
+        marker = "*" if result is best else " "
+        origin = "checkpoint" if reused else f"{result['wall_time']:.1f} s"
+        print(f"{marker}[{index + 1}/{args.candidates}] pontuação {result['score']:.1f} ± {result['score_std']:.1f}"
+              f" | movimentos {result['moves']:.1f} | {origin} | {json.dumps(result['weights'])}", flush=True)
+
+    results = tune(config, args.candidates, workers, args.checkpoint, on_candidate=report)
+    if not results:
+        return 0
+    baseline = results[0]
+    best = max(results, key=lambda result: result["score"]) # Em caso de empate, o primeiro
+    print(f"== {args.algorithm}: {len(results)} candidatos, {args.games} partidas cada")
+    print(f"  Pesos originais pontuação {baseline['score']:.1f} ± {baseline['score_std']:.1f}")
+    print(f"  Melhores pesos  pontuação {best['score']:.1f} ± {best['score_std']:.1f}: {json.dumps(best['weights'])}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(best["weights"], f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
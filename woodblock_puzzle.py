@@ -9,11 +9,17 @@ Modificações aplicadas:
 - Tamanho dos elementos da UI aumentado (exceto grelha 10x10)
 - Correção do NameError em draw_rules
 - Adição de prints de depuração para o crash do modo Humano
+- Motor e IA importáveis sem janela nem som (modo headless); o pygame
+  só é inicializado em Game.__init__ / main()
 """
 
-import pygame
+import argparse
+import atexit
+import concurrent.futures
+import multiprocessing
 import sys
 import os
+import signal
 import numpy as np
 import random
 import heapq
@@ -22,10 +28,16 @@ import io
 import base64
 import wave
 import tempfile
+import time
+from array import array
+from collections import OrderedDict
 
-# Inicialização do Pygame
-pygame.init()
-pygame.mixer.init()
+# O pygame só é necessário para a interface. O motor do jogo e as classes de IA
+# podem ser importados sem ele (modo headless: testes, simulações em lote, servidores).
+try:
+    import pygame
+except ImportError:
+    pygame = None
 
 # Configurações de áudio
 MUSIC_ENABLED = True
@@ -119,9 +131,6 @@ def play_base64_audio(base64_string):
         pygame.mixer.music.load(temp_audio_file.name)
         pygame.mixer.music.play()
 
-# Reproduzir o áudio
-play_base64_audio(BACKGROUND_MUSIC)
-
 # Função para carregar e tocar música
 def load_and_play_music():
     if MUSIC_ENABLED:
@@ -210,91 +219,663 @@ PIECE_COLORS = [
     (64, 224, 208)    # Turquesa
 ]
 
-# Configuração da tela
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Woodblock Puzzle")
-clock = pygame.time.Clock()
+# Tela, relógio e fontes: criados por init_pygame() (chamada em Game.__init__),
+# nunca na importação do módulo
+screen = None
+clock = None
+title_font = None
+menu_font = None
+button_font = None
+game_font = None
 
-# Fontes (AUMENTADAS)
-title_font = pygame.font.SysFont("Arial", 60, bold=True) # Aumentado de 48
-menu_font = pygame.font.SysFont("Arial", 45)         # Aumentado de 36
-button_font = pygame.font.SysFont("Arial", 30)        # Aumentado de 24
-game_font = pygame.font.SysFont("Arial", 25)          # Aumentado de 20
+def init_pygame():
+    """
+    Inicializa o pygame, o som, a janela e as fontes.
+    Só é necessária para a interface gráfica; pode ser chamada mais de uma vez.
+    """
+    global screen, clock, title_font, menu_font, button_font, game_font
+    if screen is not None:
+        return
+    if pygame is None:
+        raise RuntimeError("O pygame é necessário para a interface gráfica (pip install pygame)")
+
+    # Inicialização do Pygame
+    pygame.init()
+    try:
+        pygame.mixer.init()
+        # Reproduzir o áudio
+        play_base64_audio(BACKGROUND_MUSIC)
+    except pygame.error as e: # Sem dispositivo de áudio o jogo continua sem som
+        print(f"Erro do Pygame ao inicializar o som: {e}")
+
+    # Configuração da tela
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Woodblock Puzzle")
+    clock = pygame.time.Clock()
+
+    # Fontes (AUMENTADAS)
+    title_font = pygame.font.SysFont("Arial", 60, bold=True) # Aumentado de 48
+    menu_font = pygame.font.SysFont("Arial", 45)         # Aumentado de 36
+    button_font = pygame.font.SysFont("Arial", 30)        # Aumentado de 24
+    game_font = pygame.font.SysFont("Arial", 25)          # Aumentado de 20
+
+#######################
+# Bitboard (Tabuleiro como um único inteiro) #
+#######################
+# A célula (r, c) de um tabuleiro size x size corresponde ao bit r * size + c.
+# O mesmo esquema serve para 5x5 e 10x10: os inteiros do Python não têm limite de bits.
+
+def bits_to_grid(bits, size):
+    """ Converte um bitboard numa matriz size x size de 0/1. """
+    num_cells = size * size
+    raw = np.frombuffer(bits.to_bytes((num_cells + 7) // 8, "little"), dtype=np.uint8)
+    flat = np.unpackbits(raw, bitorder="little")[:num_cells]
+    return flat.reshape(size, size).astype(int)
+
+def iter_bits(bits):
+    """ Itera os índices dos bits ligados, do menor para o maior. """
+    while bits:
+        low_bit = bits & -bits
+        yield low_bit.bit_length() - 1
+        bits ^= low_bit
+
+def grid_to_bits(grid):
+    """ Converte uma matriz de 0/1 num bitboard. """
+    packed = np.packbits(np.asarray(grid).astype(bool).ravel(), bitorder="little")
+    return int.from_bytes(packed.tobytes(), "little")
+
+class PlacementTable:
+    """
+    Máscaras de colocação pré-calculadas de uma forma num tabuleiro size x size.
+    Para cada posição válida (canto superior esquerdo) guarda a máscara de bits
+    que a peça ocupa, de modo que testar uma colocação é um único AND e
+    colocar a peça é um único OR.
+
+    Os conjuntos de âncoras são representados como inteiros (bit i = âncora i).
+    cover[cell] indica as âncoras que ocupam essa célula e é usado para
+    atualizar incrementalmente as jogadas legais (ver Board.legal_placements).
+    """
+    def __init__(self, size, shape):
+        rows, cols = shape.rows, shape.cols
+        cells = shape.cells
+        base_mask = 0
+        for r, c in cells:
+            base_mask |= 1 << (r * size + c)
+
+        self.anchors = [] # Lista de (row, col) em ordem row-major
+        self.masks = []   # Máscara de bits para cada âncora
+        self.index = {}   # (row, col) -> posição em anchors/masks
+        for row in range(size - rows + 1):
+            for col in range(size - cols + 1):
+                self.index[(row, col)] = len(self.masks)
+                self.anchors.append((row, col))
+                self.masks.append(base_mask << (row * size + col))
+        # Chave de Zobrist das células de cada colocação (XOR ao colocar a peça)
+        self.zobrist = [zobrist_of_bits(mask, size) for mask in self.masks]
+        # Máscaras das linhas e colunas que cada colocação atravessa: se não havia
+        # linhas completas, só estas podem ficar completas
+        row_masks, col_masks = get_line_masks(size)
+        self.lines = []
+        for row, col in self.anchors:
+            touched_rows = sorted({row + r for r, _ in cells})
+            touched_cols = sorted({col + c for _, c in cells})
+            self.lines.append([row_masks[r] for r in touched_rows] + [col_masks[c] for c in touched_cols])
+
+        # Coordenadas relativas das células, para pintar as cores de uma só vez
+        self.cell_rows = np.array([r for r, _ in cells], dtype=int)
+        self.cell_cols = np.array([c for _, c in cells], dtype=int)
+
+        # Âncoras afetadas por cada célula, linha e coluna
+        self.cover = [0] * (size * size)
+        for i, (row, col) in enumerate(self.anchors):
+            for r, c in cells:
+                self.cover[(row + r) * size + col + c] |= 1 << i
+        self.row_cover = [0] * size
+        self.col_cover = [0] * size
+        for cell, anchors in enumerate(self.cover):
+            self.row_cover[cell // size] |= anchors
+            self.col_cover[cell % size] |= anchors
+
+    def scan(self, occupancy):
+        """ Calcula de raiz o conjunto de âncoras livres para a ocupação dada. """
+        legal = 0
+        for i, mask in enumerate(self.masks):
+            if not occupancy & mask:
+                legal |= 1 << i
+        return legal
+
+# Cache partilhada: size -> (máscaras das linhas, máscaras das colunas)
+_LINE_MASKS = {}
+
+def get_line_masks(size):
+    """ Devolve as máscaras de bits de cada linha e de cada coluna completas. """
+    masks = _LINE_MASKS.get(size)
+    if masks is None:
+        full_row = (1 << size) - 1
+        row_masks = [full_row << (r * size) for r in range(size)]
+        full_col = sum(1 << (r * size) for r in range(size))
+        col_masks = [full_col << c for c in range(size)]
+        masks = (row_masks, col_masks)
+        _LINE_MASKS[size] = masks
+    return masks
+
+def find_full_lines(size, occupancy):
+    """
+    Procura as linhas e colunas completas de uma ocupação.
+    Devolve (linhas, colunas, máscara com todas as células a limpar).
+    """
+    row_masks, col_masks = get_line_masks(size)
+    rows = [r for r, mask in enumerate(row_masks) if (occupancy & mask) == mask]
+    cols = [c for c, mask in enumerate(col_masks) if (occupancy & mask) == mask]
+    cleared_mask = 0
+    for row in rows:
+        cleared_mask |= row_masks[row]
+    for col in cols:
+        cleared_mask |= col_masks[col]
+    return rows, cols, cleared_mask
+
+# Chaves de Zobrist: um número aleatório de 64 bits por célula ocupada e por
+# peça disponível. A chave de um estado é o XOR das chaves das suas partes, por
+# isso pode ser atualizada incrementalmente a cada colocação e limpeza de linhas.
+# Os geradores têm seeds fixas: as chaves são as mesmas em todos os processos.
+_ZOBRIST_CELLS = {}  # size -> lista de chaves por célula
+_ZOBRIST_PIECES = {} # (shape_id, ocorrência) -> chave
+
+def get_zobrist_keys(size):
+    """ Devolve as chaves de Zobrist das células de um tabuleiro size x size. """
+    keys = _ZOBRIST_CELLS.get(size)
+    if keys is None:
+        rng = random.Random(f"zobrist-cells-{size}")
+        keys = [rng.getrandbits(64) for _ in range(size * size)]
+        _ZOBRIST_CELLS[size] = keys
+    return keys
+
+def zobrist_of_bits(bits, size):
+    """ XOR das chaves das células ligadas num bitboard. """
+    keys = get_zobrist_keys(size)
+    key = 0
+    for cell in iter_bits(bits):
+        key ^= keys[cell]
+    return key
+
+def zobrist_of_shapes(shape_ids):
+    """
+    Chave do multiconjunto de formas disponíveis: a ordem não conta, mas a
+    segunda cópia de uma forma tem uma chave diferente da primeira.
+    """
+    key = 0
+    seen = []
+    for shape_id in shape_ids:
+        if shape_id is None: continue
+        occurrence = seen.count(shape_id)
+        seen.append(shape_id)
+        piece_key = _ZOBRIST_PIECES.get((shape_id, occurrence))
+        if piece_key is None:
+            piece_key = random.Random(f"zobrist-piece-{shape_id}-{occurrence}").getrandbits(64)
+            _ZOBRIST_PIECES[(shape_id, occurrence)] = piece_key
+        key ^= piece_key
+    return key
+
+def zobrist_of_pieces(pieces):
+    """ Chave do multiconjunto de peças disponíveis (ver zobrist_of_shapes). """
+    return zobrist_of_shapes([piece.shape_id for piece in pieces if piece is not None])
+
+def line_potential(size, occupancy):
+    """
+    Potencial das linhas e colunas quase completas: soma de (ocupadas / size)^2
+    em cada linha e coluna. Nunca é negativo e limpar linhas só o faz descer.
+    """
+    row_masks, col_masks = get_line_masks(size)
+    potential = 0
+    for mask in row_masks:
+        potential += (bin(occupancy & mask).count("1") / size) ** 2
+    for mask in col_masks:
+        potential += (bin(occupancy & mask).count("1") / size) ** 2
+    return potential
+
+def max_potential_gain(size, placements, occupancy=None):
+    """
+    Quanto line_potential pode subir com 'placements' jogadas. Cada célula
+    colocada soma 1 à contagem de uma linha e de uma coluna; numa linha com c
+    células isso vale (c+1)^2 - c^2 = 2c + 1. Sem ocupação usa o pior caso
+    c = size - 1; com ela soma, para as linhas e para as colunas, os maiores
+    incrementos possíveis (limpar linhas só faz o potencial descer).
+    """
+    cells = placements * MAX_PIECE_CELLS
+    if occupancy is None:
+        return cells * 2 * (2 * size - 1) / size ** 2
+    gain = 0
+    for masks in get_line_masks(size):
+        increments = []
+        for mask in masks:
+            count = bin(occupancy & mask).count("1")
+            increments.extend(2 * c + 1 for c in range(count, min(size, count + cells)))
+        increments.sort(reverse=True)
+        gain += sum(increments[:cells])
+    return gain / size ** 2
+
+def iter_placements(size, occupancy, shape_ids, zobrist=0, unique=True, legal=None):
+    """
+    Gera as colocações legais das formas diretamente sobre o bitboard, já com
+    as linhas completas limpas: (posição da forma, âncora, nova ocupação, nova
+    chave de Zobrist, linhas limpas). Com unique, formas repetidas só são
+    geradas uma vez (pela primeira posição em que aparecem). 'legal' dá, pela
+    ordem de shape_ids, as âncoras livres de cada forma (p.ex. o cache
+    incremental do Board); sem ele são calculadas com PlacementTable.scan.
+    """
+    # Normalmente não há linhas completas antes da jogada e basta ver as que a peça
+    # atravessa; o tabuleiro inicial pode ter alguma, e aí verificam-se todas
+    full_before = find_full_lines(size, occupancy)[2] != 0
+    for slot, shape_id in enumerate(shape_ids):
+        if shape_id is None or (unique and shape_ids.index(shape_id) != slot): continue
+        table = get_placement_table(size, shape_id)
+        for anchor in iter_bits(table.scan(occupancy) if legal is None else legal[slot]):
+            new_occupancy = occupancy | table.masks[anchor]
+            new_zobrist = zobrist ^ table.zobrist[anchor]
+            if full_before:
+                rows, cols, cleared_mask = find_full_lines(size, new_occupancy)
+                lines = len(rows) + len(cols)
+            else:
+                cleared_mask = 0; lines = 0
+                for line_mask in table.lines[anchor]:
+                    if new_occupancy & line_mask == line_mask:
+                        cleared_mask |= line_mask; lines += 1
+            if cleared_mask:
+                new_occupancy &= ~cleared_mask
+                new_zobrist ^= zobrist_of_bits(cleared_mask, size)
+            yield slot, anchor, new_occupancy, new_zobrist, lines
+
+# Cache partilhada: (size, shape_id) -> PlacementTable
+_PLACEMENT_TABLES = {}
+
+def get_placement_table(size, shape_id):
+    """ Devolve (calculando uma única vez) a tabela de colocação da forma para o tamanho dado. """
+    key = (size, shape_id)
+    table = _PLACEMENT_TABLES.get(key)
+    if table is None:
+        table = PlacementTable(size, SHAPE_CATALOGUE[shape_id])
+        _PLACEMENT_TABLES[key] = table
+    return table
+
+#######################
+# Kernels das heurísticas #
+#######################
+# As heurísticas dos algoritmos somam termos que só dependem de quantas células
+# estão ocupadas em cada linha e coluna. Os kernels contam-nas de uma vez para
+# um lote de bitboards (um por filho) e leem o valor de cada termo de uma tabela.
+# A tabela é calculada com a mesma expressão (escalares NumPy) e as somas são
+# feitas pela mesma ordem do ciclo original, por isso os valores são iguais
+# bit a bit e os desempates entre jogadas não mudam.
+
+def occupancy_grids(size, occupancies):
+    """ Matrizes 0/1 (uint8, n x size x size) de um lote de bitboards. """
+    num_cells = size * size; num_bytes = (num_cells + 7) // 8
+    raw = np.frombuffer(b"".join(occupancy.to_bytes(num_bytes, "little") for occupancy in occupancies), dtype=np.uint8)
+    flat = np.unpackbits(raw.reshape(len(occupancies), num_bytes), axis=1, bitorder="little")[:, :num_cells]
+    return flat.reshape(len(occupancies), size, size)
+
+def line_fill_counts(size, occupancies, grids=None):
+    """ Células ocupadas em cada linha e em cada coluna: dois arrays n x size. """
+    if grids is None: grids = occupancy_grids(size, occupancies)
+    return grids.sum(axis=2, dtype=np.int64), grids.sum(axis=1, dtype=np.int64)
+
+# Cache partilhada: (size, expoente, peso) -> tabela dos termos
+_FILL_TERMS = {}
+
+def fill_term_table(size, exponent, weight):
+    """ (k / size) ** exponent * weight para k = 0..size. """
+    key = (size, exponent, weight)
+    table = _FILL_TERMS.get(key)
+    if table is None:
+        table = np.array([(np.int64(k) / size) ** exponent * weight for k in range(size + 1)])
+        _FILL_TERMS[key] = table
+    return table
+
+def batch_line_potential(size, counts, weight):
+    """
+    Soma de (linha_i / size)^2 * weight + (coluna_i / size)^2 * weight, para
+    i = 0..size-1 e para cada tabuleiro do lote ('counts' de line_fill_counts).
+    """
+    rows, cols = counts
+    table = fill_term_table(size, 2, weight)
+    row_terms = table[rows]; col_terms = table[cols]
+    potential = np.zeros(len(rows))
+    for i in range(size):
+        potential += row_terms[:, i] + col_terms[:, i]
+    return potential
+
+def batch_empty_cells(size, counts):
+    """ Células livres de cada tabuleiro do lote. """
+    return size * size - counts[0].sum(axis=1)
+
+def batch_neighbour_pairs(grids):
+    """ Pares de células ocupadas vizinhas (na horizontal ou na vertical) de cada tabuleiro. """
+    horizontal = (grids[:, :, 1:] & grids[:, :, :-1]).sum(axis=(1, 2), dtype=np.int64)
+    vertical = (grids[:, 1:, :] & grids[:, :-1, :]).sum(axis=(1, 2), dtype=np.int64)
+    return horizontal + vertical
+
+def batch_quadrant_counts(grids, split):
+    """
+    Células ocupadas nos quatro quadrantes (cortados na linha e coluna 'split'),
+    pela ordem: cima-esquerda, cima-direita, baixo-esquerda, baixo-direita.
+    Cada soma sai da tabela de somas acumuladas com quatro leituras.
+    """
+    num_boards, size, _ = grids.shape
+    table = np.zeros((num_boards, size + 1, size + 1), dtype=np.int64)
+    table[:, 1:, 1:] = grids.cumsum(axis=1, dtype=np.int64).cumsum(axis=2)
+    def rectangle(top, bottom, left, right):
+        return table[:, bottom, right] - table[:, top, right] - table[:, bottom, left] + table[:, top, left]
+    return np.stack([rectangle(0, split, 0, split), rectangle(0, split, split, size),
+                     rectangle(split, size, 0, split), rectangle(split, size, split, size)], axis=1)
+
+def batch_diagonal_pairs(grids):
+    """
+    Padrões diagonais da heurística da cascata: (r, c) e (r+1, c+1) ocupadas, e
+    (r, c+1) e (r-1, c) ocupadas, para r e c até size-2.
+    """
+    down = (grids[:, :-1, :-1] & grids[:, 1:, 1:]).sum(axis=(1, 2), dtype=np.int64)
+    up = (grids[:, 1:-1, 1:] & grids[:, :-2, :-1]).sum(axis=(1, 2), dtype=np.int64)
+    return down + up
+
+def component_sizes(size, occupancy):
+    """
+    Tamanhos dos grupos de células ocupadas ligadas (vizinhança de 4), pela
+    ordem da primeira célula de cada grupo (linha a linha). Cada grupo cresce
+    a partir dessa célula com deslocamentos do bitboard até estabilizar.
+    """
+    col_masks = get_line_masks(size)[1]
+    not_first_col = ~col_masks[0]; not_last_col = ~col_masks[-1]
+    sizes = []; remaining = occupancy
+    while remaining:
+        group = remaining & -remaining
+        while True:
+            grown = (group | ((group << 1) & not_first_col) | ((group >> 1) & not_last_col)
+                     | (group << size) | (group >> size)) & remaining
+            if grown == group: break
+            group = grown
+        sizes.append(bin(group).count("1")); remaining &= ~group
+    return sizes
+
+def batch_stability(size, occupancies, grids=None, neighbour=5, balance=2):
+    """
+    Heurística de estabilidade de cada tabuleiro: 'neighbour' por cada vizinho
+    ocupado de cada célula ocupada, menos 'balance' x a variância das células
+    pelos quadrantes.
+    """
+    if grids is None: grids = occupancy_grids(size, occupancies)
+    quadrants = batch_quadrant_counts(grids, max(1, size // 2))
+    average = quadrants.sum(axis=1) / 4.0
+    squares = (quadrants - average[:, None]) ** 2
+    variance = (squares[:, 0] + squares[:, 1] + squares[:, 2] + squares[:, 3]) / 4.0
+    return batch_neighbour_pairs(grids) * (2 * neighbour) - variance * balance
+
+# Cache partilhada: (size, limiar, expoente) -> (tabela de k^expoente, linhas quase completas)
+_CASCADE_TERMS = {}
+
+def batch_cascade_potential(size, occupancies, grids=None, counts=None,
+                            near_threshold=0.7, near_line=200, diagonal=10, group_exponent=1.5):
+    """
+    Heurística da cascata de cada tabuleiro: linhas e colunas quase completas
+    (de near_threshold até 99% das células; (fração^3) * near_line), padrões
+    diagonais (+diagonal cada) e tamanho^group_exponent de cada grupo.
+    Os termos são somados um a um pela ordem original, para dar o mesmo float.
+    """
+    if grids is None: grids = occupancy_grids(size, occupancies)
+    rows, cols = line_fill_counts(size, occupancies, grids) if counts is None else counts
+    key = (size, near_threshold, group_exponent)
+    terms = _CASCADE_TERMS.get(key)
+    if terms is None:
+        near_complete = np.array([near_threshold <= np.int64(k) / size < 1.0 for k in range(size + 1)])
+        terms = ([k ** group_exponent for k in range(size * size + 1)], near_complete)
+        _CASCADE_TERMS[key] = terms
+    group_terms, near_complete = terms
+    table = fill_term_table(size, 3, near_line) * near_complete
+    row_terms = table[rows]; col_terms = table[cols]
+    potential = np.zeros(len(rows))
+    for i in range(size):
+        potential += row_terms[:, i]; potential += col_terms[:, i]
+    diagonals = batch_diagonal_pairs(grids)
+    for step in range(int(diagonals.max(initial=0))):
+        np.add(potential, diagonal, out=potential, where=diagonals > step)
+    for index, occupancy in enumerate(occupancies):
+        value = potential[index]
+        for group in component_sizes(size, occupancy): value += group_terms[group]
+        potential[index] = value
+    return potential
+
+# Features do tabuleiro para a função de valor aprendida (LearnedEvaluator).
+# Não dependem do tamanho: cada uma está dividida pelo seu máximo.
+BOARD_FEATURES = (
+    "empty",          # células livres
+    "line_potential", # soma de (ocupadas / size)^2 das linhas e colunas
+    "near_lines",     # linhas e colunas a uma célula de ficarem completas
+    "almost_lines",   # ... e a duas células
+    "filled_pairs",   # pares de células ocupadas vizinhas
+    "row_changes",    # mudanças livre/ocupada ao longo das linhas (as paredes contam como ocupadas)
+    "col_changes",    # ... e das colunas
+    "holes",          # células livres com os quatro vizinhos ocupados (ou parede)
+    "empty_regions",  # regiões de células livres ligadas
+    "largest_region", # células da maior dessas regiões
+    "free_squares",   # quadrados 2x2 livres
+    "free_bars",      # segmentos 1x3 e 3x1 livres
+    "quadrant_balance", # variância das células ocupadas pelos quadrantes
+)
+
+def board_features(size, occupancies, grids=None, counts=None):
+    """ Matriz n x len(BOARD_FEATURES) (float) com as features de um lote de bitboards. """
+    if grids is None: grids = occupancy_grids(size, occupancies)
+    rows, cols = line_fill_counts(size, occupancies, grids) if counts is None else counts
+    num_cells = size * size; lines = 2 * size
+    features = np.zeros((len(occupancies), len(BOARD_FEATURES)))
+    features[:, 0] = batch_empty_cells(size, (rows, cols)) / num_cells
+    features[:, 1] = batch_line_potential(size, (rows, cols), 1) / lines
+    features[:, 2] = ((rows == size - 1).sum(axis=1) + (cols == size - 1).sum(axis=1)) / lines
+    features[:, 3] = ((rows == size - 2).sum(axis=1) + (cols == size - 2).sum(axis=1)) / lines
+    features[:, 4] = batch_neighbour_pairs(grids) / max(1, lines * (size - 1))
+    walled = np.pad(grids, ((0, 0), (1, 1), (1, 1)), constant_values=1)
+    features[:, 5] = (walled[:, 1:-1, 1:] != walled[:, 1:-1, :-1]).sum(axis=(1, 2)) / (size * (size + 1))
+    features[:, 6] = (walled[:, 1:, 1:-1] != walled[:, :-1, 1:-1]).sum(axis=(1, 2)) / (size * (size + 1))
+    empty = 1 - grids
+    enclosed = walled[:, :-2, 1:-1] & walled[:, 2:, 1:-1] & walled[:, 1:-1, :-2] & walled[:, 1:-1, 2:]
+    features[:, 7] = (empty & enclosed).sum(axis=(1, 2)) / num_cells
+    full = (1 << num_cells) - 1
+    for index, occupancy in enumerate(occupancies):
+        regions = component_sizes(size, full & ~occupancy)
+        features[index, 8] = len(regions) / num_cells
+        features[index, 9] = max(regions, default=0) / num_cells
+    features[:, 10] = (empty[:, :-1, :-1] & empty[:, 1:, :-1] & empty[:, :-1, 1:] & empty[:, 1:, 1:]).sum(axis=(1, 2)) / max(1, (size - 1) ** 2)
+    bars = ((empty[:, :, :-2] & empty[:, :, 1:-1] & empty[:, :, 2:]).sum(axis=(1, 2))
+            + (empty[:, :-2, :] & empty[:, 1:-1, :] & empty[:, 2:, :]).sum(axis=(1, 2)))
+    features[:, 11] = bars / max(1, lines * (size - 2))
+    quadrants = batch_quadrant_counts(grids, max(1, size // 2))
+    features[:, 12] = quadrants.var(axis=1) / (num_cells / 4) ** 2
+    return features
+
+#######################
+# Catálogo de formas #
+#######################
+class Shape:
+    """
+    Forma imutável do catálogo. Cada forma é criada uma única vez (interning)
+    e identificada pelo seu id, que é a posição em SHAPE_CATALOGUE.
+    """
+    __slots__ = ("id", "array", "rows", "cols", "cells", "num_cells", "bitmask")
+
+    def __init__(self, shape_id, array):
+        array = np.array(array, dtype=int)
+        array.flags.writeable = False
+        rows, cols = array.shape
+        cells = tuple((r, c) for r in range(rows) for c in range(cols) if array[r, c] == 1)
+        bitmask = 0 # Células na caixa envolvente da própria forma (bit r * cols + c)
+        for r, c in cells:
+            bitmask |= 1 << (r * cols + c)
+        for name, value in (("id", shape_id), ("array", array), ("rows", rows), ("cols", cols),
+                            ("cells", cells), ("num_cells", len(cells)), ("bitmask", bitmask)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("As formas do catálogo são imutáveis")
+
+    def __repr__(self):
+        return f"Shape(id={self.id}, rows={self.rows}, cols={self.cols}, cells={self.cells})"
+
+def shape_key(array):
+    """ Chave hashable que identifica uma forma (dimensões + células ocupadas). """
+    array = np.asarray(array)
+    rows, cols = array.shape
+    return (rows, cols, tuple(np.flatnonzero(array).tolist()))
+
+SHAPE_CATALOGUE = [] # shape_id -> Shape
+_SHAPE_IDS = {}      # shape_key -> shape_id
+
+def intern_shape(array):
+    """ Devolve a forma do catálogo igual a 'array', acrescentando-a se ainda não existir. """
+    key = shape_key(array)
+    shape_id = _SHAPE_IDS.get(key)
+    if shape_id is None:
+        shape_id = len(SHAPE_CATALOGUE)
+        SHAPE_CATALOGUE.append(Shape(shape_id, array))
+        _SHAPE_IDS[key] = shape_id
+    return SHAPE_CATALOGUE[shape_id]
+
+# As 24 formas que podem ser sorteadas (ids 0 a 23). Formas criadas depois,
+# por exemplo ao inverter uma peça, são acrescentadas a seguir.
+for _array in [
+    [[1]],
+    [[1, 1]], [[1], [1]],
+    [[1, 1, 1]], [[1], [1], [1]],
+    [[1, 1], [1, 0]], [[1, 1], [0, 1]],
+    [[1, 0], [1, 1]], [[0, 1], [1, 1]],
+    [[1, 1, 0], [0, 1, 0]], [[0, 1, 0], [1, 1, 0]],
+    [[1, 1, 1, 1]], [[1], [1], [1], [1]],
+    [[1, 1], [1, 1]],
+    [[1, 1, 0], [0, 1, 1]], [[0, 1, 1], [1, 1, 0]],
+    [[1, 0, 0], [1, 1, 1]], [[0, 0, 1], [1, 1, 1]],
+    [[1, 1, 1], [1, 0, 0]], [[1, 1, 1], [0, 0, 1]],
+    [[1, 0], [1, 0], [1, 1]], [[0, 1], [0, 1], [1, 1]],
+    [[1, 1], [1, 0], [1, 0]], [[1, 1], [0, 1], [0, 1]]
+]:
+    intern_shape(_array)
+NUM_BASE_SHAPES = len(SHAPE_CATALOGUE)
+# Máximos entre as formas que podem ser sorteadas: células por peça e linhas
+# que uma só jogada pode completar (as linhas e colunas que a peça atravessa)
+MAX_PIECE_CELLS = max(shape.num_cells for shape in SHAPE_CATALOGUE)
+MAX_LINES_PER_PLACEMENT = max(shape.rows + shape.cols for shape in SHAPE_CATALOGUE)
 
 #######################
 # Classe Piece (Peça) #
 #######################
 class Piece:
-    def __init__(self, shape=None, color=None):
+    """
+    Peça disponível para jogar: um valor imutável (shape_id, color).
+    Como a forma vem do catálogo partilhado, copiar uma peça é gratuito
+    e a peça pode ser usada como chave de dicionários/conjuntos.
+    """
+    __slots__ = ("shape_id", "color")
+
+    def __init__(self, shape=None, color=None, rng=None):
         """
         Inicializa uma peça com uma forma e cor específicas.
+        'shape' pode ser uma Shape do catálogo ou uma matriz de 0/1.
+        A forma e a cor em falta são sorteadas com 'rng' (por omissão, o
+        módulo random global).
         """
+        if rng is None:
+            rng = random
         if shape is None:
-            self.shape = self.generate_random_shape()
-        else:
-            self.shape = shape
+            shape = self.generate_random_shape(rng)
+        elif not isinstance(shape, Shape):
+            shape = intern_shape(shape)
 
         if color is None:
-            self.color = random.choice(PIECE_COLORS)
-        else:
-            self.color = color
+            color = rng.choice(PIECE_COLORS)
+
+        object.__setattr__(self, "shape_id", shape.id)
+        object.__setattr__(self, "color", tuple(color))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("As peças são imutáveis")
 
-        self.rows, self.cols = self.shape.shape
+    def __eq__(self, other):
+        return isinstance(other, Piece) and self.shape_id == other.shape_id and self.color == other.color
+
+    def __hash__(self):
+        return hash((self.shape_id, self.color))
+
+    def __repr__(self):
+        return f"Piece(shape_id={self.shape_id}, color={self.color})"
+
+    def __reduce__(self):
+        # Recriar a partir da matriz: os ids das formas acrescentadas fora das
+        # 24 de base podem ser diferentes noutro processo
+        return (Piece, (self.shape.tolist(), self.color))
+
+    @property
+    def shape(self):
+        """ Matriz 0/1 (só de leitura) da forma. """
+        return SHAPE_CATALOGUE[self.shape_id].array
+
+    @property
+    def rows(self):
+        return SHAPE_CATALOGUE[self.shape_id].rows
+
+    @property
+    def cols(self):
+        return SHAPE_CATALOGUE[self.shape_id].cols
 
     def copy(self):
-        """ Cria uma cópia profunda da peça. """
-        return Piece(shape=self.shape.copy(), color=self.color)
-
-    def generate_random_shape(self):
-        """ Gera uma forma aleatória para a peça. """
-        shapes = [
-            np.array([[1]]),
-            np.array([[1, 1]]), np.array([[1], [1]]),
-            np.array([[1, 1, 1]]), np.array([[1], [1], [1]]),
-            np.array([[1, 1], [1, 0]]), np.array([[1, 1], [0, 1]]),
-            np.array([[1, 0], [1, 1]]), np.array([[0, 1], [1, 1]]),
-            np.array([[1, 1, 0], [0, 1, 0]]), np.array([[0, 1, 0], [1, 1, 0]]),
-            np.array([[1, 1, 1, 1]]), np.array([[1], [1], [1], [1]]),
-            np.array([[1, 1], [1, 1]]),
-            np.array([[1, 1, 0], [0, 1, 1]]), np.array([[0, 1, 1], [1, 1, 0]]),
-            np.array([[1, 0, 0], [1, 1, 1]]), np.array([[0, 0, 1], [1, 1, 1]]),
-            np.array([[1, 1, 1], [1, 0, 0]]), np.array([[1, 1, 1], [0, 0, 1]]),
-            np.array([[1, 0], [1, 0], [1, 1]]), np.array([[0, 1], [0, 1], [1, 1]]),
-            np.array([[1, 1], [1, 0], [1, 0]]), np.array([[1, 1], [0, 1], [0, 1]])
-        ]
-        return random.choice(shapes)
+        """ As peças são imutáveis, por isso a cópia é a própria peça. """
+        return self
+
+    def generate_random_shape(self, rng=None):
+        """ Sorteia uma das formas de base do catálogo. """
+        if rng is None:
+            rng = random
+        return SHAPE_CATALOGUE[rng.randrange(NUM_BASE_SHAPES)]
 
     def flip_horizontal(self):
-        """ Inverte a peça horizontalmente. """
-        self.shape = np.fliplr(self.shape)
+        """ Devolve uma nova peça com a forma invertida horizontalmente. """
+        return Piece(shape=np.fliplr(self.shape), color=self.color)
 
     def flip_vertical(self):
-        """ Inverte a peça verticalmente. """
-        self.shape = np.flipud(self.shape)
+        """ Devolve uma nova peça com a forma invertida verticalmente. """
+        return Piece(shape=np.flipud(self.shape), color=self.color)
 
     def draw(self, surface, x, y, cell_size):
         """ Desenha a peça na superfície. """
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if self.shape[row, col] == 1:
-                    rect = pygame.Rect(
-                        x + col * cell_size,
-                        y + row * cell_size,
-                        cell_size,
-                        cell_size
-                    )
-                    pygame.draw.rect(surface, self.color, rect)
-                    pygame.draw.rect(surface, BLACK, rect, 1)  # Borda
+        for row, col in SHAPE_CATALOGUE[self.shape_id].cells:
+            rect = pygame.Rect(
+                x + col * cell_size,
+                y + row * cell_size,
+                cell_size,
+                cell_size
+            )
+            pygame.draw.rect(surface, self.color, rect)
+            pygame.draw.rect(surface, BLACK, rect, 1)  # Borda
 
 #######################
 # Classe Board (Tabuleiro) #
 #######################
 class Board:
-    def __init__(self, size, difficulty="medium"):
-        """ Inicializa o tabuleiro do jogo. """
+    def __init__(self, size, difficulty="medium", rng=None):
+        """
+        Inicializa o tabuleiro do jogo.
+        'rng' é o gerador (random.Random) usado para os blocos iniciais e as
+        peças novas; por omissão é o módulo random global.
+        """
         self.size = size
         self.difficulty = difficulty
-        self.grid = np.zeros((size, size), dtype=int)
+        self.rng = rng if rng is not None else random
+        self.occupancy = 0 # Bitboard: bit r * size + c ligado se a célula (r, c) está ocupada
+        self._grid_cache = None
+        self._grid_cache_bits = None
+        # Jogadas legais por forma: shape_id -> (PlacementTable, conjunto de âncoras livres).
+        # Só é válido para a ocupação em _legal_bits; é atualizado incrementalmente.
+        self._legal = {}
+        self._legal_bits = 0
+        # Chave de Zobrist da ocupação, válida para a ocupação em _zobrist_bits
+        self._zobrist = 0
+        self._zobrist_bits = 0
         self.colors = np.zeros((size, size, 3), dtype=int)
         self.score = 0
 
@@ -306,109 +887,278 @@ class Board:
             self.num_initial_blocks = int(size * size * 0.3)
 
         self.initialize_board()
-        self.available_pieces = [Piece() for _ in range(3)]
+        self.available_pieces = [Piece(rng=self.rng) for _ in range(3)]
+
+    @property
+    def grid(self):
+        """
+        Vista da ocupação como matriz size x size (0/1), só de leitura.
+        É recalculada apenas quando o bitboard muda.
+        """
+        if self._grid_cache_bits != self.occupancy:
+            grid = bits_to_grid(self.occupancy, self.size)
+            grid.flags.writeable = False
+            self._grid_cache = grid
+            self._grid_cache_bits = self.occupancy
+        return self._grid_cache
+
+    @grid.setter
+    def grid(self, value):
+        self.occupancy = grid_to_bits(value)
+
+    @property
+    def zobrist(self):
+        """
+        Chave de Zobrist da ocupação. É atualizada incrementalmente por
+        place_piece/clear_lines e recalculada se a ocupação mudar por fora.
+        """
+        if self._zobrist_bits != self.occupancy:
+            self._zobrist = zobrist_of_bits(self.occupancy, self.size)
+            self._zobrist_bits = self.occupancy
+        return self._zobrist
+
+    def state_key(self, pieces=None):
+        """ Chave de Zobrist do estado: ocupação + multiconjunto de peças disponíveis. """
+        if pieces is None:
+            pieces = self.available_pieces
+        return self.zobrist ^ zobrist_of_pieces(pieces)
 
     def copy(self):
-        """ Cria uma cópia profunda do tabuleiro. """
-        new_board = Board(self.size, self.difficulty)
-        new_board.grid = self.grid.copy()
+        """
+        Cria uma cópia do tabuleiro sem passar pelo construtor (que sortearia
+        blocos e peças só para serem descartados). Copia a ocupação, as cores,
+        a pontuação e as referências às peças; as peças não são alteradas
+        durante a busca, por isso podem ser partilhadas.
+        """
+        new_board = Board.__new__(Board)
+        new_board.size = self.size
+        new_board.difficulty = self.difficulty
+        new_board.rng = self.rng
+        new_board.num_initial_blocks = self.num_initial_blocks
+        new_board.occupancy = self.occupancy
+        new_board._grid_cache = self._grid_cache # Só de leitura, pode ser partilhada
+        new_board._grid_cache_bits = self._grid_cache_bits
+        new_board._legal = dict(self._legal)
+        new_board._legal_bits = self._legal_bits
+        new_board._zobrist = self._zobrist
+        new_board._zobrist_bits = self._zobrist_bits
         new_board.colors = self.colors.copy()
         new_board.score = self.score
-        # Copiar available_pieces também é importante para a IA não modificar o original
-        new_board.available_pieces = [p.copy() if p else None for p in self.available_pieces]
+        # Lista nova, para a IA não modificar a lista do original
+        new_board.available_pieces = list(self.available_pieces)
         return new_board
 
+    def __getstate__(self):
+        """ Para enviar o tabuleiro a outro processo: sem caches e sem o módulo random global. """
+        state = self.__dict__.copy()
+        state["_legal"] = {}; state["_legal_bits"] = None
+        state["_grid_cache"] = None; state["_grid_cache_bits"] = None
+        if state["rng"] is random:
+            state["rng"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.rng is None:
+            self.rng = random
+
     def initialize_board(self):
         """ Inicializa o tabuleiro com blocos aleatórios. """
-        self.grid.fill(0)
+        self.occupancy = 0
         self.colors.fill(0)
         blocks_added = 0
         while blocks_added < self.num_initial_blocks:
-            row = random.randint(0, self.size - 1)
-            col = random.randint(0, self.size - 1)
-            if self.grid[row, col] == 0:
-                self.grid[row, col] = 1
-                self.colors[row, col] = random.choice(PIECE_COLORS)
+            row = self.rng.randint(0, self.size - 1)
+            col = self.rng.randint(0, self.size - 1)
+            bit = 1 << (row * self.size + col)
+            if not self.occupancy & bit:
+                self.occupancy |= bit
+                self.colors[row, col] = self.rng.choice(PIECE_COLORS)
                 blocks_added += 1
+        self._zobrist = zobrist_of_bits(self.occupancy, self.size)
+        self._zobrist_bits = self.occupancy
+
+    def is_occupied(self, row, col):
+        """ Indica se a célula (row, col) está ocupada. """
+        return (self.occupancy >> (row * self.size + col)) & 1 == 1
 
     def can_place_piece(self, piece, row, col):
         """ Verifica se uma peça pode ser colocada em uma posição específica. """
         if piece is None: return False # Segurança
-        if row < 0 or col < 0 or row + piece.rows > self.size or col + piece.cols > self.size:
+        table = get_placement_table(self.size, piece.shape_id)
+        anchor = table.index.get((row, col))
+        if anchor is None: # Fora dos limites do tabuleiro
             return False
-        for r in range(piece.rows):
-            for c in range(piece.cols):
-                if piece.shape[r, c] == 1 and self.grid[row + r, col + c] == 1:
-                    return False
-        return True
+        return not self.occupancy & table.masks[anchor]
 
     def place_piece(self, piece, row, col):
         """ Coloca uma peça no tabuleiro. """
         if piece is None: return False # Segurança
-        if not self.can_place_piece(piece, row, col):
+        table = get_placement_table(self.size, piece.shape_id)
+        anchor = table.index.get((row, col))
+        if anchor is None:
+            return False
+        mask = table.masks[anchor]
+        if self.occupancy & mask:
             return False
-        for r in range(piece.rows):
-            for c in range(piece.cols):
-                if piece.shape[r, c] == 1:
-                    self.grid[row + r, col + c] = 1
-                    self.colors[row + r, col + c] = piece.color
+        self._sync_legal()
+        if self._zobrist_bits == self.occupancy:
+            self._zobrist ^= table.zobrist[anchor]
+            self._zobrist_bits = self.occupancy | mask
+        self.occupancy |= mask
+        self._legal_bits = self.occupancy
+        for key, (other, legal) in self._legal.items():
+            blocked = 0
+            for cell in iter_bits(mask):
+                blocked |= other.cover[cell]
+            self._legal[key] = (other, legal & ~blocked)
+        self.colors[row + table.cell_rows, col + table.cell_cols] = piece.color
         rows_cleared, cols_cleared = self.clear_lines()
         if rows_cleared > 0 or cols_cleared > 0:
             self.update_score(rows_cleared, cols_cleared)
         return True
 
+    def _sync_legal(self):
+        """ Descarta o cache de jogadas legais se a ocupação mudou por fora dos métodos incrementais. """
+        if self._legal_bits != self.occupancy:
+            self._legal = {}
+            self._legal_bits = self.occupancy
+
+    def _legal_anchors(self, piece):
+        """ Devolve (tabela, conjunto de âncoras livres) da peça, calculando-o só na primeira vez. """
+        self._sync_legal()
+        entry = self._legal.get(piece.shape_id)
+        if entry is None:
+            table = get_placement_table(self.size, piece.shape_id)
+            entry = (table, table.scan(self.occupancy))
+            self._legal[piece.shape_id] = entry
+        return entry
+
+    def legal_placements(self, piece):
+        """ Lista as posições (row, col) onde a peça pode ser colocada, em ordem row-major. """
+        if piece is None: return []
+        table, legal = self._legal_anchors(piece)
+        anchors = table.anchors
+        placements = []
+        while legal:
+            low_bit = legal & -legal
+            placements.append(anchors[low_bit.bit_length() - 1])
+            legal ^= low_bit
+        return placements
+
+    def evaluate_placements(self, pieces=None):
+        """
+        Avalia todas as jogadas legais das peças (por omissão, as disponíveis)
+        sem copiar o tabuleiro: PlacementBatch com as ações, pela mesma ordem
+        de GameState.get_possible_actions, e a ocupação, a chave de Zobrist, as
+        linhas limpas e a pontuação que cada uma deixa.
+        """
+        if pieces is None: pieces = self.available_pieces
+        shapes = tuple(piece.shape_id if piece is not None else None for piece in pieces)
+        actions = []; occupancies = []; zobrists = []; lines_cleared = []; scores = []
+        legal = [self._legal_anchors(piece)[1] if piece is not None else 0 for piece in pieces]
+        points = {} # linhas limpas -> pontos
+        for slot, anchor, occupancy, zobrist, lines in iter_placements(self.size, self.occupancy, shapes, self.zobrist,
+                                                                        unique=False, legal=legal):
+            row, col = get_placement_table(self.size, shapes[slot]).anchors[anchor]
+            if lines not in points: points[lines] = self.clear_points(lines)
+            actions.append((slot, 0, row, col)); occupancies.append(occupancy); zobrists.append(zobrist)
+            lines_cleared.append(lines); scores.append(self.score + points[lines])
+        return PlacementBatch(self.size, actions, occupancies, zobrists, lines_cleared, scores)
+
+    def has_legal_move(self, pieces=None):
+        """ Indica se alguma das peças (por omissão, as disponíveis) cabe no tabuleiro. """
+        if pieces is None: pieces = self.available_pieces
+        for piece in pieces:
+            if piece is not None and self._legal_anchors(piece)[1]:
+                return True
+        return False
+
     def clear_lines(self):
         """ Verifica e elimina linhas e colunas completas. """
-        rows_to_clear = [r for r in range(self.size) if np.all(self.grid[r, :] == 1)]
-        cols_to_clear = [c for c in range(self.size) if np.all(self.grid[:, c] == 1)]
+        occupancy = self.occupancy
+        # Todas as linhas e colunas completas juntas numa só máscara, limpas de uma vez
+        rows_to_clear, cols_to_clear, cleared_mask = find_full_lines(self.size, occupancy)
 
         if not rows_to_clear and not cols_to_clear:
             return 0, 0
 
-        # Criar cópia para animação (opcional, mas pode ser útil)
-        # cleared_mask = np.zeros_like(self.grid)
-
-        for row in rows_to_clear:
-            self.grid[row, :] = 0
-            self.colors[row, :] = 0
-            # cleared_mask[row, :] = 1
-        for col in cols_to_clear:
-            self.grid[:, col] = 0
-            self.colors[:, col] = 0
-            # cleared_mask[:, col] = 1 # Marcar colunas também
+        self.occupancy = occupancy & ~cleared_mask
+        if self._zobrist_bits == occupancy:
+            # Todas as células limpas estavam ocupadas: sai o XOR das suas chaves
+            self._zobrist ^= zobrist_of_bits(cleared_mask, self.size)
+            self._zobrist_bits = self.occupancy
+        self.colors[bits_to_grid(cleared_mask, self.size) == 1] = 0
+
+        # Só as âncoras que tocam nas linhas limpas podem ter voltado a ficar livres
+        if self._legal_bits == occupancy:
+            self._legal_bits = self.occupancy
+            for key, (table, legal) in self._legal.items():
+                candidates = 0
+                for row in rows_to_clear:
+                    candidates |= table.row_cover[row]
+                for col in cols_to_clear:
+                    candidates |= table.col_cover[col]
+                for i in iter_bits(candidates & ~legal):
+                    if not self.occupancy & table.masks[i]:
+                        legal |= 1 << i
+                self._legal[key] = (table, legal)
 
         # TODO: Adicionar aqui uma pequena pausa ou animação se desejado
 
         return len(rows_to_clear), len(cols_to_clear)
 
 
-    def update_score(self, rows_cleared, cols_cleared):
-        """ Atualiza a pontuação. """
+    def clear_points(self, lines_cleared):
+        """ Pontos ganhos por eliminar 'lines_cleared' linhas/colunas numa só jogada. """
         base_points = 100
         size_multiplier = 1 if self.size == 5 else 2
         difficulty_multiplier = 1
         if self.difficulty == "medium": difficulty_multiplier = 1.5
         elif self.difficulty == "hard": difficulty_multiplier = 2.0
-        combo_multiplier = 1 + 0.5 * (rows_cleared + cols_cleared - 1) if (rows_cleared + cols_cleared) > 0 else 1
-        points = int(base_points * (rows_cleared + cols_cleared) * size_multiplier * difficulty_multiplier * combo_multiplier)
-        self.score += points
+        combo_multiplier = 1 + 0.5 * (lines_cleared - 1) if lines_cleared > 0 else 1
+        return int(base_points * lines_cleared * size_multiplier * difficulty_multiplier * combo_multiplier)
+
+    def max_clear_points(self, placements, occupancy=None):
+        """
+        Limite superior (admissível) dos pontos que 'placements' jogadas podem
+        ganhar a partir da ocupação dada, quaisquer que sejam as peças.
+        Cada célula colocada fica numa só linha e numa só coluna, por isso com C
+        células só se fecha um conjunto de linhas cujas células vazias somem no
+        máximo C (o mesmo para as colunas). Como o combo cresce com o número de
+        linhas, o melhor caso é juntar o máximo de linhas em cada jogada.
+        """
+        if placements <= 0:
+            return 0
+        if occupancy is None:
+            occupancy = self.occupancy
+        size = self.size
+        cells = placements * MAX_PIECE_CELLS
+        lines = 0
+        for masks in get_line_masks(size):
+            # Linhas já limpas podem voltar a ser preenchidas e limpas (custam size células)
+            empties = sorted([size - bin(occupancy & mask).count("1") for mask in masks] + [size] * (cells // size))
+            budget = cells
+            for empty in empties:
+                if empty > budget:
+                    break
+                budget -= empty
+                lines += 1
+        lines = min(lines, placements * MAX_LINES_PER_PLACEMENT)
+        full_placements, rest = divmod(lines, MAX_LINES_PER_PLACEMENT)
+        return full_placements * self.clear_points(MAX_LINES_PER_PLACEMENT) + self.clear_points(rest)
+
+    def update_score(self, rows_cleared, cols_cleared):
+        """ Atualiza a pontuação. """
+        self.score += self.clear_points(rows_cleared + cols_cleared)
 
     def generate_new_piece(self):
         """ Gera uma nova peça aleatória. """
-        return Piece()
+        return Piece(rng=self.rng)
 
     def is_game_over(self):
         """ Verifica se o jogo acabou. """
-        for piece in self.available_pieces:
-            if piece is None: continue # Ignora espaços vazios
-            # Otimização: Se a peça for maior que o tabuleiro, não pode ser colocada
-            if piece.rows > self.size or piece.cols > self.size:
-                continue
-            for row in range(self.size - piece.rows + 1):
-                for col in range(self.size - piece.cols + 1):
-                    if self.can_place_piece(piece, row, col):
-                        return False # Encontrou um movimento possível
-        return True # Nenhuma peça pode ser colocada
+        return not self.has_legal_move() # Nenhuma peça pode ser colocada
 
     def draw(self, surface, x, y, cell_size):
         """ Desenha o tabuleiro na superfície. """
@@ -424,7 +1174,7 @@ class Board:
                     x + col * cell_size, y + row * cell_size,
                     cell_size, cell_size
                 )
-                if self.grid[row, col] == 1:
+                if self.is_occupied(row, col):
                     color = tuple(self.colors[row, col])
                     pygame.draw.rect(surface, color, cell_rect)
                 else:
@@ -471,8 +1221,39 @@ class Board:
 # --- Classes de IA (GameState, AStarSearch, etc.) - Mantidas como estavam ---
 # ... (O código das classes GameState, AStarSearch, GreedySearch, BFSSearch,
 #      DFSSearch, DynamicStabilitySearch, CascadeSearch permanece o mesmo que você forneceu) ...
+class PlacementBatch:
+    """
+    Jogadas de um estado avaliadas de uma só vez (Board.evaluate_placements),
+    sem criar os estados filhos: listas paralelas com a ação, a ocupação e a
+    chave de Zobrist do tabuleiro depois das limpezas, as linhas limpas e a
+    pontuação (array) a que a jogada leva.
+    """
+    __slots__ = ("size", "actions", "occupancies", "zobrists", "lines", "scores")
+
+    def __init__(self, size, actions, occupancies, zobrists, lines, scores):
+        self.size = size
+        self.actions = actions
+        self.occupancies = occupancies
+        self.zobrists = zobrists
+        self.lines = lines
+        self.scores = np.array(scores, dtype=np.int64)
+
+    def __len__(self): return len(self.actions)
+
+    @classmethod
+    def from_states(cls, states):
+        """ Lote com estados filhos já criados (as linhas limpas não são conhecidas: None). """
+        return cls(states[0].board.size, [state.action for state in states],
+                   [state.board.occupancy for state in states], [state.board.zobrist for state in states],
+                   [None] * len(states), [state.score for state in states])
+
 class GameState:
-    def __init__(self, board, available_pieces, score=0, parent=None, action=None, depth=0):
+    def __init__(self, board, available_pieces, score=0, parent=None, action=None, depth=0, rng=None):
+        # Se for dado um gerador, as peças "imaginárias" sorteadas durante a busca
+        # (apply_action) saem dele: a mesma seed dá sempre a mesma árvore de busca
+        if rng is not None:
+            board.rng = rng
+        self.rng = board.rng
         self.board = board
         self.available_pieces = available_pieces
         self.score = score
@@ -484,80 +1265,274 @@ class GameState:
         actions = []
         for piece_index, piece in enumerate(self.available_pieces):
             if piece is None: continue
-            for row in range(self.board.size - piece.rows + 1):
-                for col in range(self.board.size - piece.cols + 1):
-                    if self.board.can_place_piece(piece, row, col):
-                        actions.append((piece_index, 0, row, col))
+            for row, col in self.board.legal_placements(piece):
+                actions.append((piece_index, 0, row, col))
         return actions
-    def apply_action(self, action):
+    def evaluate_actions(self):
+        """ Todas as jogadas legais avaliadas sem criar os filhos (ver Board.evaluate_placements). """
+        return self.board.evaluate_placements(self.available_pieces)
+    def apply_action(self, action, new_piece=None):
         piece_index, rotation, row, col = action
+        # 1. Copiar estado (uma única cópia do tabuleiro por filho)
         new_board = self.board.copy()
-        new_pieces = [p.copy() if p else None for p in self.available_pieces]
-        piece = new_pieces[piece_index]
-        if new_board.place_piece(piece, row, col):
-             new_pieces[piece_index] = new_board.generate_new_piece() # Gera nova peça APENAS se colocou com sucesso
-        # Se place_piece falhar (o que não deveria acontecer se get_possible_actions estiver correto),
-        # podemos querer lidar com isso, mas por agora assumimos que funciona.
-        # Se a peça não puder ser colocada, o estado não deveria mudar muito,
-        # mas a peça usada não seria substituída. Isso pode ser um problema para a IA.
-        # Vamos garantir que generate_new_piece só acontece se place_piece retornar True.
-        # A lógica atual já faz isso implicitamente dentro de place_piece.
-
-        # CORREÇÃO: a peça usada deve ser removida ou substituída *após* ser usada
-        # A lógica atual substitui a peça ANTES de saber se há game over, o que está errado.
-        # Vamos refatorar ligeiramente. place_piece agora só coloca e retorna True/False.
-        # A substituição acontece no nível do jogo (GamePlay/AIGamePlay).
-
-        # Refatorando apply_action para refletir melhor o fluxo real:
-        # 1. Copiar estado
-        new_board_after_place = self.board.copy()
-        new_pieces_after_place = [p.copy() if p else None for p in self.available_pieces]
-
-        # 2. Tentar colocar a peça na cópia
-        piece_to_place = new_pieces_after_place[piece_index]
-        placed_successfully = new_board_after_place.place_piece(piece_to_place, row, col)
-
-        # 3. Se colocou, "remover" a peça usada (ou gerar nova no lugar dela)
-        if placed_successfully:
-             new_pieces_after_place[piece_index] = new_board_after_place.generate_new_piece()
-        else:
-             # Se não conseguiu colocar (não deveria acontecer se veio de get_possible_actions),
-             # o estado não muda efetivamente em relação à peça. Retornar o mesmo estado? Ou erro?
-             # Por segurança, vamos assumir que a ação era válida.
-             # Se não fosse, a busca da IA não deveria ter considerado esta ação.
-             # Vamos manter a lógica original aqui, mas cientes da potencial inconsistência
-             # se can_place_piece e place_piece não estiverem perfeitamente sincronizados.
-             # A lógica original de substituir a peça parece ser a intenção para a simulação da IA.
-             # Vamos reverter para a substituição original, mas garantir que generate_new_piece é chamado.
-             new_pieces_after_place[piece_index] = new_board_after_place.generate_new_piece() # Mantém a substituição
+        new_pieces = list(self.available_pieces)
+
+        # 2. Colocar a peça na cópia. As ações vêm de get_possible_actions, por isso
+        #    a colocação é válida; mesmo que falhe, a peça é substituída, como na
+        #    simulação original da IA.
+        new_board.place_piece(new_pieces[piece_index], row, col)
+
+        # 3. Substituir a peça usada por uma nova (sorteada, se não for dada)
+        new_pieces[piece_index] = new_board.generate_new_piece() if new_piece is None else new_piece
+        new_board.available_pieces = new_pieces
 
         return GameState(
-            board=new_board_after_place, # Usar o tabuleiro após a tentativa de colocar
-            available_pieces=new_pieces_after_place,
-            score=new_board_after_place.score,
+            board=new_board,
+            available_pieces=new_pieces,
+            score=new_board.score,
             parent=self, action=action, depth=self.depth + 1
         )
 
-    def is_terminal(self): return self.board.is_game_over()
+    def is_terminal(self): return not self.board.has_legal_move(self.available_pieces)
+    def key(self): return self.board.state_key(self.available_pieces)
+    def path(self):
+        """ Passos (ação + shape_id da peça usada) desde a raiz da busca até este estado. """
+        path = []; state = self
+        while state.parent is not None:
+            path.append(state.action + (state.parent.available_pieces[state.action[0]].shape_id,))
+            state = state.parent
+        path.reverse()
+        return path
+
+#######################
+# Tabela de transposições #
+#######################
+class TTEntry:
+    """ Entrada da tabela de transposições (ver TranspositionTable). """
+    __slots__ = ("key", "depth", "score", "value", "best_action", "generation")
+
+    def __init__(self, key, depth, score, value, best_action, generation):
+        self.key = key
+        self.depth = depth
+        self.score = score
+        self.value = value
+        self.best_action = best_action
+        self.generation = generation
+
+class TranspositionTable:
+    """
+    Tabela de transposições limitada, indexada pela chave de Zobrist do estado
+    (GameState.key: ocupação + peças disponíveis). Cada entrada guarda:
+      depth       - profundidade que faltava explorar a partir do estado
+      score       - a melhor pontuação com que o estado foi alcançado
+      value       - o melhor ganho encontrado a partir dele
+      best_action - a primeira jogada desse melhor caminho
+      generation  - a busca (decisão) que a guardou
+
+    A tabela pertence ao algoritmo e é mantida entre decisões da mesma partida:
+    as entradas de buscas anteriores não servem para cortar nós (o horizonte
+    mudou), mas a DFSSearch tenta primeiro a melhor jogada que lá guardou.
+    A* e BFS só a usam para descartar transposições dentro de cada busca.
+
+    Políticas de substituição:
+      "depth" - vetor de tamanho fixo indexado por key % capacity; uma entrada
+                da busca atual só é substituída por outra explorada a igual ou
+                maior profundidade;
+      "lru"   - dicionário ordenado; quando está cheio sai a entrada usada há
+                mais tempo.
+    """
+    POLICIES = ("depth", "lru")
+
+    def __init__(self, capacity=1 << 16, policy="depth"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política de substituição desconhecida: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self.generation = 0
+        self.hits = 0; self.misses = 0
+        self.clear()
+
+    def clear(self):
+        """ Esvazia a tabela. """
+        self._entries = [None] * self.capacity if self.policy == "depth" else OrderedDict()
+
+    def __len__(self):
+        if self.policy == "depth":
+            return sum(1 for entry in self._entries if entry is not None)
+        return len(self._entries)
+
+    def new_search(self):
+        """ Começa uma nova busca: as entradas guardadas passam a ser de buscas anteriores. """
+        self.generation += 1
+
+    def lookup(self, key):
+        """ Devolve a entrada da chave, ou None. """
+        if self.policy == "depth":
+            entry = self._entries[key % self.capacity]
+            if entry is not None and entry.key != key:
+                entry = None
+        else:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None: self.misses += 1
+        else: self.hits += 1
+        return entry
+
+    def store(self, key, depth, score, value=0, best_action=None):
+        """ Guarda (ou atualiza) a entrada da chave, segundo a política de substituição. """
+        if self.policy == "depth":
+            index = key % self.capacity
+            entry = self._entries[index]
+            if (entry is not None and entry.key != key and entry.generation == self.generation
+                    and entry.depth > depth):
+                return # Preferência pela entrada explorada mais a fundo
+        else:
+            entry = self._entries.get(key)
+
+        if entry is not None and entry.key == key:
+            # Mesmo estado: a melhor jogada guardada continua útil como sugestão
+            entry.depth = depth; entry.score = score; entry.generation = self.generation
+            if best_action is not None:
+                entry.value = value; entry.best_action = best_action
+            if self.policy == "lru":
+                self._entries.move_to_end(key)
+            return
+
+        entry = TTEntry(key, depth, score, value, best_action, self.generation)
+        if self.policy == "depth":
+            self._entries[index] = entry
+        else:
+            self._entries[key] = entry
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def seen(self, key, score, depth=0):
+        """
+        Indica se o estado já foi alcançado nesta busca com pontuação igual ou
+        maior e com pelo menos 'depth' de profundidade por explorar. Nesse caso
+        o nó atual é uma transposição dominada e pode ser ignorado.
+        """
+        entry = self.lookup(key)
+        return (entry is not None and entry.generation == self.generation
+                and entry.score >= score and entry.depth >= depth)
+
+class HeuristicWeights:
+    """
+    Pesos da heurística de um algoritmo: os valores por omissão (DEFAULT_WEIGHTS
+    da classe) são os do código original, e só esses nomes podem ser mudados.
+    Lêem-se como atributos (weights.line) e as_dict() dá um dicionário que pode
+    ser guardado em JSON ou enviado a outros processos.
+    """
+    def __init__(self, defaults, values=None):
+        if isinstance(values, HeuristicWeights): values = values.as_dict()
+        values = dict(values or {})
+        unknown = sorted(set(values) - set(defaults))
+        if unknown:
+            known = ", ".join(defaults) if defaults else "este algoritmo não tem pesos"
+            raise ValueError(f"Pesos desconhecidos: {', '.join(unknown)} (conhecidos: {known})")
+        self.__dict__.update(defaults); self.__dict__.update(values)
+
+    def as_dict(self): return dict(self.__dict__)
+    def __eq__(self, other): return isinstance(other, HeuristicWeights) and self.__dict__ == other.__dict__
+    def __repr__(self): return f"HeuristicWeights({self.__dict__})"
+
+class SearchAlgorithm:
+    """
+    Protocolo comum (anytime) dos algoritmos de busca:
+
+        search(state, deadline=None, node_budget=None, ...) -> (plano, pontuação, nós, profundidade)
+
+    O plano é uma lista de passos (piece_index, rotation, row, col, shape_id):
+    a ação, como em GameState.get_possible_actions, seguida da forma que a
+    busca assumiu estar nessa posição. Depois do primeiro passo as peças
+    novas são imaginárias, por isso quem executa o plano tem de confirmar a
+    forma antes de cada passo (ver AIPlayer.next_step_valid).
+
+    deadline é um instante de time.perf_counter() e node_budget um número de
+    nós, na unidade de cada algoritmo (estados expandidos, colocações
+    avaliadas ou iterações do MCTS). A busca pára no limite que chegar
+    primeiro e devolve o melhor plano encontrado até aí; sem nenhum dos dois
+    usa os limites por omissão da classe. Os parâmetros antigos
+    (max_iterations, time_limit) continuam a ser aceites.
+
+    Durante a busca, noutra thread (p.ex. a interface):
+      - best_plan() devolve (plano, pontuação) do melhor resultado até agora;
+      - request_stop() pede à busca que pare no próximo ponto de verificação.
+        O pedido fica até clear_stop(), que quem lança a busca chama antes de
+        a lançar (um pedido feito antes de a busca começar não se perde);
+      - nodes_explored vai sendo atualizado.
+
+    Os algoritmos com heurística declaram os seus pesos em DEFAULT_WEIGHTS e
+    aceitam weights=... (dicionário ou HeuristicWeights) no construtor.
+    """
+    DEFAULT_NODE_BUDGET = None # Limites usados quando search() não recebe nenhum
+    DEFAULT_TIME_LIMIT = None
+    DEFAULT_WEIGHTS = {} # Nome do peso -> valor original
+    WEIGHT_BOUNDS = {}   # Nome do peso -> (mínimo, máximo), para os pesos que têm limites
+
+    stop_requested = False
+    _deadline = None; _node_budget = None
+    _best = ([], None)
+
+    def request_stop(self): self.stop_requested = True
+    def clear_stop(self): self.stop_requested = False
+    def best_plan(self): return self._best
+
+    def _start_search(self, initial_state, deadline=None, node_budget=None, time_limit=None):
+        """ Fixa os limites da busca e limpa as estatísticas e o melhor plano (o pedido de paragem fica). """
+        now = time.perf_counter()
+        if time_limit is not None:
+            deadline = now + time_limit if deadline is None else min(deadline, now + time_limit)
+        if deadline is None and node_budget is None:
+            node_budget = self.DEFAULT_NODE_BUDGET
+            if self.DEFAULT_TIME_LIMIT is not None: deadline = now + self.DEFAULT_TIME_LIMIT
+        self._deadline = deadline; self._node_budget = node_budget
+        self.nodes_explored = 0; self.max_depth = 0
+        self._best = ([], initial_state.score)
+
+    def budget_exhausted(self):
+        """ True se a busca deve parar: pedido de paragem, orçamento de nós ou prazo esgotado. """
+        if self.stop_requested: return True
+        if self._node_budget is not None and self.nodes_explored >= self._node_budget: return True
+        return self._deadline is not None and time.perf_counter() >= self._deadline
 
 # --- Classes AStar, Greedy, BFS, DFS, DynamicStability, Cascade ---
 # MANTIDAS COMO ESTAVAM NO CÓDIGO FORNECIDO
-class AStarSearch:
-    def __init__(self): self.nodes_explored = 0; self.max_depth = 0
+class AStarSearch(SearchAlgorithm):
+    # line e empty: heuristic(); horizon_line: potencial nas folhas de search_horizon
+    DEFAULT_WEIGHTS = {"line": 100, "empty": 5, "horizon_line": 50}
+    DEFAULT_NODE_BUDGET = 1000
+
+    def __init__(self, transposition_table=None, weights=None):
+        self.weights = HeuristicWeights(self.DEFAULT_WEIGHTS, weights)
+        self.nodes_explored = 0; self.max_depth = 0; self.nodes_pruned = 0
+        self.tt = transposition_table if transposition_table is not None else TranspositionTable()
     def heuristic(self, state):
-        score_value = state.score; board = state.board; potential = 0
-        for i in range(board.size):
-            row_filled = np.sum(board.grid[i, :]); col_filled = np.sum(board.grid[:, i])
-            potential += (row_filled / board.size)**2*100 + (col_filled / board.size)**2*100
-        empty_spaces = np.sum(board.grid == 0); space_value = empty_spaces * 5
-        return score_value + potential + space_value
-    def search(self, initial_state, max_iterations=1000):
-        self.nodes_explored = 0; self.max_depth = 0; open_set = []; closed_set = set()
+        return self.heuristics([state])[0]
+    def heuristics(self, states):
+        """
+        heuristic() de um lote de estados do mesmo tamanho: pontuação + potencial
+        das linhas e colunas + um valor por célula livre (kernels vetorizados).
+        """
+        size = states[0].board.size; weights = self.weights
+        counts = line_fill_counts(size, [state.board.occupancy for state in states])
+        scores = np.array([state.score for state in states])
+        return scores + batch_line_potential(size, counts, weights.line) + batch_empty_cells(size, counts) * weights.empty
+    def search(self, initial_state, max_iterations=None, deadline=None, node_budget=None, horizon=None):
+        """
+        Best-first search pela heurística. Com horizon, faz antes a busca de
+        horizonte limitado (search_horizon). max_iterations é o node_budget antigo.
+        """
+        if node_budget is None: node_budget = max_iterations
+        if horizon is not None:
+            return self.search_horizon(initial_state, horizon, deadline=deadline, node_budget=node_budget)
+        self._start_search(initial_state, deadline, node_budget); open_set = []; self.nodes_pruned = 0
+        self.tt.new_search() # A tabela faz de closed set (chave de Zobrist + pontuação)
         f_value = self.heuristic(initial_state) # Heurística deve ser positiva aqui
         heapq.heappush(open_set, (f_value, initial_state)) # Armazenar (f_value, state)
-        best_state = initial_state; best_score = initial_state.score; iterations = 0
-        while open_set and iterations < max_iterations:
-            iterations += 1
+        best_state = initial_state; best_score = initial_state.score
+        while open_set and not self.budget_exhausted():
             # A* usa f = g + h. Aqui 'g' seria -profundidade ou 0, e 'h' a heurística.
             # A heurística atual parece mais um valor de estado 'v'.
             # Se quisermos A*, priorizamos f = profundidade + (-heuristica_potencial) ou algo assim.
@@ -568,225 +1543,1034 @@ class AStarSearch:
             f_value, current_state = heapq.heappop(open_set)
             self.nodes_explored += 1; self.max_depth = max(self.max_depth, current_state.depth)
 
-            # Usar hash do grid para closed_set
-            current_hash = hash(current_state.board.grid.tobytes())
-            if current_hash in closed_set: continue
-            closed_set.add(current_hash)
+            # Estado já expandido nesta busca com pontuação igual ou maior
+            current_key = current_state.key()
+            if self.tt.seen(current_key, current_state.score): continue
+            self.tt.store(current_key, 0, current_state.score)
 
-            if current_state.score > best_score: best_state = current_state; best_score = current_state.score
+            if current_state.score > best_score:
+                best_state = current_state; best_score = current_state.score
+                self._best = (best_state.path(), best_score)
             if current_state.is_terminal():
                  # Mesmo se for terminal, pode não ser o melhor score encontrado
                  # break # Não fazer break necessariamente, continuar explorando outros ramos se max_iterations permitir
                  continue # Continua explorando outros nós na open_set
 
-            for action in current_state.get_possible_actions():
-                next_state = current_state.apply_action(action)
-                next_hash = hash(next_state.board.grid.tobytes())
-                if next_hash not in closed_set:
-                    f_val = -self.heuristic(next_state) # Prioridade é -valor (maior valor tem menor f_val)
-                    heapq.heappush(open_set, (f_val, next_state)) # Adiciona com prioridade
+            children = [current_state.apply_action(action) for action in current_state.get_possible_actions()]
+            children = [child for child in children if not self.tt.seen(child.key(), child.score)]
+            if not children: continue
+            for next_state, value in zip(children, self.heuristics(children)):
+                heapq.heappush(open_set, (-value, next_state)) # Prioridade é -valor (maior valor tem menor f_val)
 
-        path = []; state = best_state
-        while state.parent is not None: path.append(state.action); state = state.parent
-        path.reverse()
+        path = best_state.path()
         # O score retornado deve ser o do best_state encontrado
         return path, best_state.score, self.nodes_explored, self.max_depth
 
-class GreedySearch:
-    def __init__(self): self.nodes_explored = 0; self.max_depth = 0
-    def evaluate(self, state, action):
-        next_state = state.apply_action(action); score_gain = next_state.score - state.score
-        board = next_state.board; potential = 0
-        for i in range(board.size):
-            row_filled = np.sum(board.grid[i, :]); col_filled = np.sum(board.grid[:, i])
-            potential += (row_filled / board.size)**2*50 + (col_filled / board.size)**2*50
-        return score_gain + potential
-    def search(self, initial_state, max_depth=100):
-        self.nodes_explored = 0; self.max_depth = 0
-        current_state = initial_state; path = []
-        while len(path) < max_depth and not current_state.is_terminal():
-            self.nodes_explored += 1; self.max_depth = max(self.max_depth, len(path))
-            actions = current_state.get_possible_actions()
-            if not actions: break
-            best_action = None; best_value = float('-inf')
-            for action in actions:
-                value = self.evaluate(current_state, action)
-                if value > best_value: best_value = value; best_action = action
-            if best_action is None: break # Se não há ação boa, parar
-            path.append(best_action); current_state = current_state.apply_action(best_action)
-        return path, current_state.score, self.nodes_explored, self.max_depth
-
-class BFSSearch:
-    def __init__(self): self.nodes_explored = 0; self.max_depth = 0
-    def search(self, initial_state, max_iterations=1000):
-        self.nodes_explored = 0; self.max_depth = 0; queue = []; queue.append(initial_state)
-        visited = set(); visited.add(hash(initial_state.board.grid.tobytes())) # Hash inicial
-        best_state = initial_state; best_score = initial_state.score; iterations = 0
-        while queue and iterations < max_iterations:
-            iterations += 1; current_state = queue.pop(0); self.nodes_explored += 1
-            self.max_depth = max(self.max_depth, current_state.depth)
-            # Encontrou um estado com score melhor
-            if current_state.score > best_score: best_state = current_state; best_score = current_state.score
-            # Não parar no primeiro terminal, continuar busca até limite
-            if current_state.is_terminal(): continue
-
-            for action in current_state.get_possible_actions():
-                next_state = current_state.apply_action(action)
-                state_hash = hash(next_state.board.grid.tobytes())
-                if state_hash not in visited:
-                    visited.add(state_hash); queue.append(next_state)
-
-        path = []; state = best_state
-        while state.parent is not None: path.append(state.action); state = state.parent
-        path.reverse()
-        return path, best_state.score, self.nodes_explored, self.max_depth
+    def search_horizon(self, initial_state, horizon=3, max_iterations=None, deadline=None, node_budget=None):
+        """
+        A* / branch and bound com horizonte limitado: procura o melhor valor ao
+        fim de 'horizon' jogadas (ou no fim do jogo, se vier antes), em que o
+        valor de uma folha é a pontuação + o potencial das linhas quase completas
+        (desempate entre planos com os mesmos pontos).
+
+        f(n) = pontuação de n + limite superior admissível do que ainda pode
+        ganhar: Board.max_clear_points (linhas que é possível fechar com as
+        células que faltam colocar) + o potencial atual + max_potential_gain.
+        Os nós saem da fila por f decrescente; qualquer nó cujo f não passe a
+        melhor folha encontrada é cortado com toda a sua subárvore, e a busca
+        termina (com o ótimo) quando o melhor f da fila já não a passa.
+        nodes_pruned conta os nós cortados. Se o orçamento acabar antes da
+        primeira folha, devolve o caminho até ao nó gerado com melhor valor.
+
+        Como nos outros algoritmos, a peça que substitui a usada é imaginária:
+        é sorteada uma vez por profundidade, a partir do gerador do estado.
+        """
+        self._start_search(initial_state, deadline, max_iterations if node_budget is None else node_budget)
+        self.nodes_pruned = 0
+        if horizon <= 0: # O próprio estado é a folha (p.ex. um processo da ParallelSearch com horizonte 1)
+            return [], initial_state.score, 0, 0
+        board = initial_state.board; size = board.size
+        replacements = [initial_state.rng.randrange(NUM_BASE_SHAPES) for _ in range(horizon)]
+        shapes = tuple(piece.shape_id if piece is not None else None for piece in initial_state.available_pieces)
+        self.tt.new_search()
+
+        def leaf_value(score, occupancy):
+            return score + line_potential(size, occupancy) * self.weights.horizon_line
+        def upper_bound(score, occupancy, depth):
+            remaining = horizon - depth
+            return (score + board.max_clear_points(remaining, occupancy)
+                    + (line_potential(size, occupancy) + max_potential_gain(size, remaining, occupancy)) * self.weights.horizon_line)
+        def path_to(node):
+            path = []
+            while node[6] is not None: path.append(node[5] + (node[6][2][node[5][0]],)); node = node[6]
+            path.reverse()
+            return path
+
+        # Nó: (ocupação, Zobrist, formas, pontuação, profundidade, ação, pai)
+        root = (board.occupancy, board.zobrist, shapes, initial_state.score, 0, None, None)
+        best_node = None; best_value = float("-inf")
+        partial_node = None; partial_value = float("-inf") # Melhor nó interior, enquanto não há folhas
+        open_set = []; counter = 0 # O contador desempata (e evita comparar os nós)
+        heapq.heappush(open_set, (-upper_bound(initial_state.score, board.occupancy, 0), 0, counter, root))
+        while open_set and not self.budget_exhausted():
+            negative_f, _, _, node = heapq.heappop(open_set)
+            if -negative_f <= best_value:
+                # Nenhum nó na fila pode bater a melhor folha: ótimo encontrado
+                self.nodes_pruned += len(open_set) + 1; open_set = []
+                break
+            occupancy, zobrist, shapes, score, depth, _, _ = node
+            self.nodes_explored += 1; self.max_depth = max(self.max_depth, depth)
+            has_children = False
+            for slot, anchor, new_occupancy, new_zobrist, lines in iter_placements(size, occupancy, shapes, zobrist):
+                has_children = True
+                row, col = get_placement_table(size, shapes[slot]).anchors[anchor]
+                new_shapes = shapes[:slot] + (replacements[depth],) + shapes[slot + 1:]
+                new_score = score + board.clear_points(lines)
+                child = (new_occupancy, new_zobrist, new_shapes, new_score, depth + 1, (slot, 0, row, col), node)
+                if depth + 1 == horizon:
+                    value = leaf_value(new_score, new_occupancy)
+                    if value > best_value:
+                        best_value = value; best_node = child; self._best = (path_to(child), new_score)
+                    continue
+                key = new_zobrist ^ zobrist_of_shapes(new_shapes)
+                if self.tt.seen(key, new_score, horizon - depth - 1): continue # Transposição dominada
+                if best_node is None:
+                    value = leaf_value(new_score, new_occupancy)
+                    if value > partial_value:
+                        partial_value = value; partial_node = child; self._best = (path_to(child), new_score)
+                f_value = upper_bound(new_score, new_occupancy, depth + 1)
+                if f_value <= best_value:
+                    self.nodes_pruned += 1; continue
+                self.tt.store(key, horizon - depth - 1, new_score)
+                counter += 1
+                # Em caso de empate em f, o nó mais fundo primeiro (chega mais cedo a folhas)
+                heapq.heappush(open_set, (-f_value, -(depth + 1), counter, child))
+            if not has_children and score > best_value:
+                best_value = score; best_node = node; self._best = (path_to(node), score) # Fim do jogo antes do horizonte
+
+        if best_node is None: best_node = partial_node
+        if best_node is None:
+            return [], initial_state.score, self.nodes_explored, self.max_depth
+        return path_to(best_node), best_node[3], self.nodes_explored, self.max_depth
+
+class BeamSearch(SearchAlgorithm):
+    """
+    Motor de beam search: em cada jogada avalia de uma vez todas as jogadas de
+    cada estado do feixe (GameState.evaluate_actions, sem criar os filhos),
+    dá-lhes um valor com evaluate_placements(pai, lote) e mantém as beam_width
+    melhores (estados repetidos, pela chave de Zobrist, só contam uma vez).
+    Só as jogadas escolhidas chegam a ser aplicadas. Com beam_width=1 é a busca
+    gulosa original.
+
+    A forma da peça imaginária que substitui a usada é sorteada para cada
+    jogada, pela ordem das ações (um sorteio por jogada, como no MCTS e na
+    DFS); a peça completa, com a cor, só é criada para as jogadas que entram
+    no feixe. A mesma seed continua a dar a mesma busca.
+
+    Sem max_depth, a busca vai até DEFAULT_MAX_DEPTH jogadas.
+
+    As subclasses só definem evaluate_placements; evaluate_child,
+    evaluate_children e evaluate(state, action) são mantidos por compatibilidade.
+    """
+    DEFAULT_MAX_DEPTH = 20
+    def __init__(self, beam_width=1, weights=None):
+        self.weights = HeuristicWeights(self.DEFAULT_WEIGHTS, weights)
+        self.nodes_explored = 0; self.max_depth = 0; self.beam_width = beam_width
+    def evaluate_placements(self, parent, batch):
+        """ Valores (maior é melhor) das jogadas de um PlacementBatch de 'parent'. """
+        raise NotImplementedError
+    def evaluate_children(self, parent, children):
+        """ Valores de estados filhos já criados (os mesmos das jogadas correspondentes). """
+        return self.evaluate_placements(parent, PlacementBatch.from_states(children))
+    def evaluate_child(self, parent, child): return self.evaluate_children(parent, [child])[0]
+    def evaluate(self, state, action): return self.evaluate_child(state, state.apply_action(action))
+    def search(self, initial_state, max_depth=None, beam_width=None, deadline=None, node_budget=None):
+        if max_depth is None: max_depth = self.DEFAULT_MAX_DEPTH
+        if beam_width is None: beam_width = self.beam_width
+        self._start_search(initial_state, deadline, node_budget); beam = [initial_state]
+        for ply in range(max_depth):
+            candidates = {} # chave do estado -> (valor, ordem, pai, ação, forma da peça nova)
+            exhausted = False
+            for state in beam:
+                # Uma jogada a meio não é comparável: fica o feixe da jogada anterior
+                if self.budget_exhausted(): exhausted = True; break
+                batch = state.evaluate_actions()
+                if not batch.actions: continue # Estado terminal: não tem filhos
+                self.nodes_explored += 1; self.max_depth = max(self.max_depth, ply)
+                rng = state.board.rng
+                replacements = [rng.randrange(NUM_BASE_SHAPES) for _ in batch.actions]
+                shapes = [piece.shape_id if piece is not None else None for piece in state.available_pieces]
+                for action, zobrist, shape_id, value in zip(batch.actions, batch.zobrists, replacements,
+                                                            self.evaluate_placements(state, batch)):
+                    slot = action[0]
+                    key = zobrist ^ zobrist_of_shapes(shapes[:slot] + [shape_id] + shapes[slot + 1:])
+                    previous = candidates.get(key)
+                    if previous is None or value > previous[0]: candidates[key] = (value, len(candidates), state, action, shape_id)
+            if exhausted or not candidates: break
+            # Os melhores beam_width; em caso de empate fica o primeiro gerado, como no ciclo guloso
+            best = heapq.nsmallest(beam_width, candidates.values(), key=lambda c: (-c[0], c[1]))
+            beam = [state.apply_action(action, new_piece=Piece(SHAPE_CATALOGUE[shape_id], rng=state.board.rng))
+                    for _, _, state, action, shape_id in best]
+            self._best = (beam[0].path(), beam[0].score)
+        final_state = beam[0]
+        return final_state.path(), final_state.score, self.nodes_explored, self.max_depth
+
+class GreedySearch(BeamSearch):
+    DEFAULT_WEIGHTS = {"gain": 1, "line": 50}
+    def evaluate_placements(self, state, batch):
+        """ Pontos ganhos + potencial das linhas e colunas de cada jogada, num só lote. """
+        counts = line_fill_counts(batch.size, batch.occupancies)
+        return (batch.scores - state.score) * self.weights.gain + batch_line_potential(batch.size, counts, self.weights.line)
+
+class FrontierLevel:
+    """
+    Um nível da fronteira da BFS em vetores compactos, um índice por estado,
+    em vez de um GameState (cópia do tabuleiro, cores, peças, pai) por nó.
+    """
+    __slots__ = ("occupancy", "zobrist", "shapes", "score", "parent", "action")
+    NO_PIECE = 255 # Posição sem peça em 'shapes'
 
-class DFSSearch:
-    def __init__(self): self.nodes_explored = 0; self.max_depth = 0
-    def search(self, initial_state, max_depth_limit=20): # Renomeado para evitar conflito
-        self.nodes_explored = 0; self.max_depth = 0; stack = []; stack.append(initial_state)
-        visited = set() # Visited por profundidade pode ser necessário para evitar ciclos longos
-        best_state = initial_state; best_score = initial_state.score
-        while stack:
-            current_state = stack.pop(); self.nodes_explored += 1
-            self.max_depth = max(self.max_depth, current_state.depth)
-
-            # Hash considerando profundidade para evitar voltar ao mesmo grid em menor profundidade
-            state_hash = (hash(current_state.board.grid.tobytes()), current_state.depth)
-            if state_hash in visited: continue
-            visited.add(state_hash)
-
-            if current_state.score > best_score: best_state = current_state; best_score = current_state.score
-            # Não parar necessariamente no terminal, pode haver score melhor
-            if current_state.is_terminal(): continue
-            if current_state.depth >= max_depth_limit: continue
-
-            # Adicionar ações à pilha (ordem pode importar, talvez inverter para explorar "melhores" primeiro?)
-            possible_actions = current_state.get_possible_actions()
-            # random.shuffle(possible_actions) # Opcional: Aleatorizar ordem
-            for action in reversed(possible_actions): # Empilhar em ordem inversa para processar ~ordem normal
-                next_state = current_state.apply_action(action)
-                # Verifica hash simples (sem profundidade) para não adicionar se já explorado mais fundo
-                simple_hash = hash(next_state.board.grid.tobytes())
-                # Não vamos adicionar à pilha se já visitamos este *estado exato* nesta profundidade ou mais raso
-                # A lógica de visited no início do loop já cuida disso.
-                stack.append(next_state)
-
-        path = []; state = best_state
-        while state.parent is not None: path.append(state.action); state = state.parent
+    def __init__(self):
+        self.occupancy = []       # Bitboards (inteiros do Python, podem ter mais de 64 bits)
+        self.zobrist = array("Q") # Chave de Zobrist da ocupação
+        self.shapes = array("L")  # shape_ids das 3 peças, 8 bits cada
+        self.score = array("q")
+        self.parent = array("l")  # Índice do pai no nível anterior
+        self.action = array("l")  # posição da peça * ACTION_STRIDE + âncora
+
+    ACTION_STRIDE = 4096
+
+    def __len__(self): return len(self.occupancy)
+
+    def append(self, occupancy, zobrist, shapes, score, parent, action):
+        self.occupancy.append(occupancy); self.zobrist.append(zobrist); self.shapes.append(shapes)
+        self.score.append(score); self.parent.append(parent); self.action.append(action)
+
+    @classmethod
+    def pack_shapes(cls, shape_ids):
+        packed = 0
+        for i, shape_id in enumerate(shape_ids):
+            packed |= (cls.NO_PIECE if shape_id is None else shape_id) << (8 * i)
+        return packed
+
+    @classmethod
+    def unpack_shapes(cls, packed, count=3):
+        shape_ids = []
+        for i in range(count):
+            shape_id = (packed >> (8 * i)) & 0xFF
+            shape_ids.append(None if shape_id == cls.NO_PIECE else shape_id)
+        return tuple(shape_ids)
+
+    @staticmethod
+    def record_bytes(size):
+        """ Memória aproximada de um estado: bitboard + ponteiro na lista + vetores. """
+        return sys.getsizeof(1 << (size * size)) + 8 + 8 + 4 + 8 + 4 + 4
+
+class BFSSearch(SearchAlgorithm):
+    """
+    Busca em largura nível a nível (level-synchronous). Cada nível é um
+    FrontierLevel compacto; os filhos são gerados diretamente sobre o bitboard
+    (tabelas de colocação + limpeza de linhas), sem copiar tabuleiros. As peças
+    que substituem as usadas continuam a ser sorteadas do gerador do estado
+    inicial, como em GameState.apply_action.
+
+    Pára ao esgotar o orçamento (node_budget estados expandidos, ou o antigo
+    max_iterations; deadline), ao fim de max_depth níveis ou no limite de
+    memória (memory_limit_mb) estimado para os estados guardados.
+    frontier_sizes tem o número de estados guardados em cada nível (do
+    último só ficam os que batem o melhor) e memory_limited indica se a busca
+    parou no limite de memória. A tabela de transposições só serve para
+    descartar estados repetidos dentro da busca.
+    """
+    DEFAULT_NODE_BUDGET = 1000
+
+    def __init__(self, transposition_table=None):
+        self.nodes_explored = 0; self.max_depth = 0
+        self.frontier_sizes = []; self.memory_limited = False
+        self.tt = transposition_table if transposition_table is not None else TranspositionTable()
+    def search(self, initial_state, max_iterations=None, max_depth=None, memory_limit_mb=256, deadline=None, node_budget=None):
+        self._start_search(initial_state, deadline, max_iterations if node_budget is None else node_budget)
+        self.memory_limited = False
+        board = initial_state.board; size = board.size; rng = initial_state.rng
+        max_records = int(memory_limit_mb * 1024 * 1024 // FrontierLevel.record_bytes(size))
+        num_pieces = len(initial_state.available_pieces)
+        shapes = tuple(piece.shape_id if piece is not None else None for piece in initial_state.available_pieces)
+
+        self.tt.new_search()
+        root = FrontierLevel()
+        root.append(board.occupancy, board.zobrist, FrontierLevel.pack_shapes(shapes), initial_state.score, -1, -1)
+        self.tt.store(board.zobrist ^ zobrist_of_shapes(shapes), 0, initial_state.score)
+        levels = [root]; self.frontier_sizes = [1]; num_records = 1
+        best_level, best_index, best_score = 0, 0, initial_state.score
+
+        stop = False
+        while not stop and (max_depth is None or len(levels) <= max_depth):
+            current = levels[-1]; next_level = FrontierLevel(); generated = 0
+            # O último nível nunca é expandido: dele só interessa o melhor estado
+            last_level = max_depth is not None and len(levels) == max_depth
+            for i in range(len(current)):
+                if self.budget_exhausted(): stop = True; break
+                self.nodes_explored += 1
+                occupancy = current.occupancy[i]; zobrist = current.zobrist[i]; score = current.score[i]
+                shapes = FrontierLevel.unpack_shapes(current.shapes[i], num_pieces)
+                for slot, anchor, new_occupancy, new_zobrist, lines in iter_placements(size, occupancy, shapes, zobrist):
+                    new_score = score + board.clear_points(lines)
+                    new_shapes = shapes[:slot] + (rng.randrange(NUM_BASE_SHAPES),) + shapes[slot + 1:]
+                    key = new_zobrist ^ zobrist_of_shapes(new_shapes)
+                    if self.tt.seen(key, new_score): continue
+                    self.tt.store(key, 0, new_score)
+                    generated += 1
+                    if last_level and new_score <= best_score: continue
+                    if num_records >= max_records:
+                        self.memory_limited = True; stop = True; break
+                    next_level.append(new_occupancy, new_zobrist, FrontierLevel.pack_shapes(new_shapes),
+                                      new_score, i, slot * FrontierLevel.ACTION_STRIDE + anchor)
+                    num_records += 1
+                    if new_score > best_score:
+                        best_level, best_index, best_score = len(levels), len(next_level) - 1, new_score
+                if stop: break
+            if not generated: break
+            levels.append(next_level); self.frontier_sizes.append(len(next_level))
+            self.max_depth = len(levels) - 1
+            self._best = (self._path(levels, best_level, best_index, num_pieces, size), best_score)
+
+        path = self._path(levels, best_level, best_index, num_pieces, size)
+        return path, best_score, self.nodes_explored, self.max_depth
+
+    def _path(self, levels, level_index, index, num_pieces, size):
+        """ Reconstrói o caminho até um estado pelos índices dos pais. """
+        path = []
+        while level_index > 0:
+            level = levels[level_index]; parent_level = levels[level_index - 1]; parent = level.parent[index]
+            slot, anchor = divmod(level.action[index], FrontierLevel.ACTION_STRIDE)
+            parent_shapes = FrontierLevel.unpack_shapes(parent_level.shapes[parent], num_pieces)
+            row, col = get_placement_table(size, parent_shapes[slot]).anchors[anchor]
+            path.append((slot, 0, row, col, parent_shapes[slot]))
+            level_index, index = level_index - 1, parent
         path.reverse()
-        return path, best_state.score, self.nodes_explored, self.max_depth
+        return path
 
-class DynamicStabilitySearch:
-    def __init__(self): self.nodes_explored = 0; self.max_depth = 0
+class DFSSearch(SearchAlgorithm):
+    """
+    Busca em profundidade com aprofundamento iterativo (profundidade 1, 2, ...
+    até max_depth_limit), sobre bitboards como a BFSSearch.
+
+    - Branch and bound: um nó é cortado se nem o máximo de pontos que ainda
+      pode ganhar (Board.max_clear_points) chega para bater o melhor estado.
+    - Ordenação das jogadas: primeiro a melhor jogada guardada na tabela de
+      transposições (da iteração anterior ou de uma decisão anterior), depois
+      as killer moves da profundidade, depois a tabela de histórico e por fim
+      uma heurística barata (pontos + potencial das linhas quase completas).
+      As jogadas são identificadas por (forma, âncora).
+    - Orçamento: pára no deadline (ou ao fim de time_limit segundos) ou ao
+      fim de node_budget nós e devolve o melhor plano encontrado até aí.
+
+    Em cada iteração a peça imaginária que substitui a usada a uma dada
+    profundidade é sempre a mesma (sorteada uma vez por busca), para as
+    iterações explorarem a mesma árvore.
+    """
+    NUM_KILLERS = 2
+    DEFAULT_NODE_BUDGET = 5000 # Os limites que o jogo sempre usou: sem eles a busca não acaba
+    DEFAULT_TIME_LIMIT = 1.0
+    DEFAULT_WEIGHTS = {"line": 50} # Potencial das linhas no valor das folhas
+
+    def __init__(self, transposition_table=None, weights=None):
+        self.weights = HeuristicWeights(self.DEFAULT_WEIGHTS, weights)
+        self.nodes_explored = 0; self.max_depth = 0; self.nodes_pruned = 0
+        self.tt = transposition_table if transposition_table is not None else TranspositionTable()
+    def search(self, initial_state, max_depth_limit=20, time_limit=None, node_budget=None, deadline=None): # Renomeado para evitar conflito
+        self._start_search(initial_state, deadline, node_budget, time_limit)
+        self.nodes_pruned = 0
+        board = initial_state.board
+        self._board = board; self._size = board.size
+        self._stopped = False
+        self._replacements = [initial_state.rng.randrange(NUM_BASE_SHAPES) for _ in range(max_depth_limit)]
+        self._killers = [[] for _ in range(max_depth_limit)]
+        self._history = {}
+        self.best_score = initial_state.score; self.best_path = []
+        shapes = tuple(piece.shape_id if piece is not None else None for piece in initial_state.available_pieces)
+
+        for depth_limit in range(1, max_depth_limit + 1):
+            self.tt.new_search(); self._path = []
+            self._dfs(board.occupancy, board.zobrist, shapes, initial_state.score, 0, depth_limit)
+            # O melhor plano vai para a tabela: é tentado primeiro na iteração
+            # seguinte e na próxima decisão
+            for depth, (action, _, key, score) in enumerate(self.best_path):
+                self.tt.store(key, len(self.best_path) - depth, score, value=self.best_score - score, best_action=action)
+            if self._stopped: break
+            self.max_depth = depth_limit
+        return self._plan(), self.best_score, self.nodes_explored, self.max_depth
+
+    def _plan(self):
+        # move = (forma, âncora)
+        return [action + (move[0],) for action, move, _, _ in self.best_path]
+
+    def _dfs(self, occupancy, zobrist, shapes, score, depth, depth_limit):
+        self.nodes_explored += 1
+        if score > self.best_score:
+            self.best_score = score; self.best_path = list(self._path)
+            self._best = (self._plan(), score)
+            # O caminho até ao novo melhor estado alimenta as killer moves e o histórico
+            for d, (_, move, _, _) in enumerate(self._path):
+                killers = self._killers[d]
+                if move not in killers:
+                    killers.insert(0, move); del killers[self.NUM_KILLERS:]
+                self._history[move] = self._history.get(move, 0) + (depth_limit - d) ** 2
+        if depth == depth_limit: return
+        if self.budget_exhausted(): self._stopped = True; return
+        remaining = depth_limit - depth
+        if score + self._board.max_clear_points(remaining, occupancy) <= self.best_score:
+            self.nodes_pruned += 1; return
+        key = zobrist ^ zobrist_of_shapes(shapes)
+        entry = self.tt.lookup(key)
+        if entry is not None and entry.generation == self.tt.generation and entry.score >= score and entry.depth >= remaining:
+            return # Transposição dominada (ver TranspositionTable.seen)
+        hint = entry.best_action if entry is not None else None
+        self.tt.store(key, remaining, score)
+
+        children = []
+        killers = self._killers[depth]
+        for slot, anchor, new_occupancy, new_zobrist, lines in iter_placements(self._size, occupancy, shapes, zobrist):
+            shape_id = shapes[slot]
+            row, col = get_placement_table(self._size, shape_id).anchors[anchor]
+            action = (slot, 0, row, col); move = (shape_id, anchor)
+            points = self._board.clear_points(lines)
+            order = (action == hint, move in killers, self._history.get(move, 0),
+                     points + line_potential(self._size, new_occupancy) * self.weights.line)
+            children.append((order, action, move, new_occupancy, new_zobrist, points))
+        children.sort(key=lambda child: child[0], reverse=True)
+
+        new_piece = self._replacements[depth]
+        for _, action, move, new_occupancy, new_zobrist, points in children:
+            self._path.append((action, move, key, score))
+            new_shapes = shapes[:action[0]] + (new_piece,) + shapes[action[0] + 1:]
+            self._dfs(new_occupancy, new_zobrist, new_shapes, score + points, depth + 1, depth_limit)
+            self._path.pop()
+            if self._stopped: return
+
+class DynamicStabilitySearch(BeamSearch):
+    # neighbour e balance: pesos dentro de evaluate_stability (vizinhos, variância dos quadrantes)
+    DEFAULT_WEIGHTS = {"gain": 2, "stability": 1.5, "line": 100, "empty": 3, "neighbour": 5, "balance": 2}
+    DEFAULT_MAX_DEPTH = 5 # Profundidade menor para heurísticas complexas
     def evaluate_stability(self, board):
-        stability_score = 0; grid = board.grid; size = board.size
-        for r in range(size):
-            for c in range(size):
-                if grid[r,c]==1:
-                    n=0
-                    if r>0 and grid[r-1,c]==1: n+=1
-                    if r<size-1 and grid[r+1,c]==1: n+=1
-                    if c>0 and grid[r,c-1]==1: n+=1
-                    if c<size-1 and grid[r,c+1]==1: n+=1
-                    stability_score += n*5
-        q_size = max(1,size//2); q_counts=[0]*4
-        for r in range(q_size):
-             for c in range(q_size):
-                  if r<size and c<size and grid[r,c]==1: q_counts[0]+=1
-             for c in range(q_size, size):
-                  if r<size and c<size and grid[r,c]==1: q_counts[1]+=1
-        for r in range(q_size, size):
-             for c in range(q_size):
-                  if r<size and c<size and grid[r,c]==1: q_counts[2]+=1
-             for c in range(q_size, size):
-                  if r<size and c<size and grid[r,c]==1: q_counts[3]+=1
-        if sum(q_counts) == 0: return stability_score # Evitar divisão por zero se tabuleiro vazio
-        avg_b = sum(q_counts) / 4.0; variance = sum((ct-avg_b)**2 for ct in q_counts)/4.0
-        stability_score -= variance*2
-        return stability_score
-    def evaluate(self, state, action):
-        try:
-            next_state = state.apply_action(action); score_gain = next_state.score - state.score
-            stability = self.evaluate_stability(next_state.board); board = next_state.board; potential = 0
-            for i in range(board.size):
-                r_fill = sum(board.grid[i,:]); c_fill = sum(board.grid[:,i])
-                potential += (r_fill/board.size)**2*100 + (c_fill/board.size)**2*100
-            empty = np.sum(board.grid==0); space = empty*3
-            return score_gain*2 + stability*1.5 + potential + space
-        except Exception as e: print(f"Erro DS evaluate: {e}"); return float('-inf')
-    def search(self, initial_state, max_depth=5): # Profundidade menor para heurísticas complexas
-        # Esta é uma busca GULOSA usando a heurística complexa, não A* ou similar.
-        # Similar ao GreedySearch, mas com função 'evaluate' diferente.
-        try:
-            self.nodes_explored=0; self.max_depth=0; current_state=initial_state; path=[]
-            while len(path)<max_depth and not current_state.is_terminal():
-                self.nodes_explored+=1; self.max_depth=max(self.max_depth, len(path))
-                actions = current_state.get_possible_actions();
-                if not actions: break
-                best_action = None; best_value = float('-inf')
-                for action in actions:
-                    value = self.evaluate(current_state, action)
-                    if value > best_value: best_value=value; best_action=action
-                if best_action is not None:
-                    path.append(best_action); current_state = current_state.apply_action(best_action)
-                else: break
-            return path, current_state.score, self.nodes_explored, self.max_depth
-        except Exception as e: print(f"Erro DS search: {e}"); traceback.print_exc(); return [],0,0,0
-
-class CascadeSearch:
-    def __init__(self): self.nodes_explored = 0; self.max_depth = 0
+        return self.stability_values(board.size, [board.occupancy])[0]
+    def stability_values(self, size, occupancies, grids=None):
+        return batch_stability(size, occupancies, grids, self.weights.neighbour, self.weights.balance)
+    def evaluate_placements(self, state, batch):
+        size = batch.size; occupancies = batch.occupancies; weights = self.weights
+        grids = occupancy_grids(size, occupancies); counts = line_fill_counts(size, occupancies, grids)
+        gains = batch.scores - state.score
+        stability = self.stability_values(size, occupancies, grids)
+        return (gains*weights.gain + stability*weights.stability + batch_line_potential(size, counts, weights.line)
+                + batch_empty_cells(size, counts)*weights.empty)
+
+class CascadeSearch(BeamSearch):
+    # near_threshold, near_line, diagonal e group_exponent: pesos dentro de evaluate_cascade_potential
+    DEFAULT_WEIGHTS = {"gain": 3, "cascade": 2, "clear_bonus": 2, "empty": 2,
+                       "near_threshold": 0.7, "near_line": 200, "diagonal": 10, "group_exponent": 1.5}
+    WEIGHT_BOUNDS = {"near_threshold": (0.0, 1.0)}
+    DEFAULT_MAX_DEPTH = 5
     def evaluate_cascade_potential(self, board):
-        try:
-            cascade_score = 0; grid = board.grid; size = board.size
-            near_comp_thresh = 0.7;
-            for i in range(size):
-                r_fill = sum(grid[i,:]); c_fill = sum(grid[:,i])
-                r_pct = r_fill/size; c_pct = c_fill/size
-                if r_pct >= near_comp_thresh and r_pct < 1.0: cascade_score += (r_pct**3)*200
-                if c_pct >= near_comp_thresh and c_pct < 1.0: cascade_score += (c_pct**3)*200
-            for r in range(size-1):
-                for c in range(size-1):
-                    if grid[r,c]==1 and grid[r+1,c+1]==1: cascade_score += 10
-                    if r>0 and c<size-1 and grid[r,c+1]==1 and grid[r-1,c]==1: cascade_score += 10 # Erro aqui antes, corrigido
-            visited = set()
-            def count_group_size(r,c):
-                if not (0<=r<size and 0<=c<size) or (r,c) in visited or grid[r,c]==0: return 0
-                visited.add((r,c)); size_count=1
-                size_count += count_group_size(r-1,c); size_count += count_group_size(r+1,c)
-                size_count += count_group_size(r,c-1); size_count += count_group_size(r,c+1)
-                return size_count
-            for r in range(size):
-                for c in range(size):
-                    if grid[r,c]==1 and (r,c) not in visited:
-                        group_size = count_group_size(r,c); cascade_score += group_size**1.5
-            return cascade_score
-        except Exception as e: print(f"Erro CS potential: {e}"); return 0
-    def evaluate(self, state, action):
-        try:
-            next_state=state.apply_action(action); score_gain = next_state.score - state.score
-            cascade_potential = self.evaluate_cascade_potential(next_state.board)
-            elim_bonus = score_gain * 2 if score_gain > 0 else 0
-            board = next_state.board; empty = np.sum(board.grid==0); space = empty*2
-            return score_gain*3 + cascade_potential*2 + elim_bonus + space
-        except Exception as e: print(f"Erro CS evaluate: {e}"); return float('-inf')
-    def search(self, initial_state, max_depth=5): # Profundidade menor
-        # Busca GULOSA usando a heurística de cascata.
-        try:
-            self.nodes_explored=0; self.max_depth=0; current_state=initial_state; path=[]
-            while len(path)<max_depth and not current_state.is_terminal():
-                self.nodes_explored+=1; self.max_depth=max(self.max_depth, len(path))
-                actions = current_state.get_possible_actions()
-                if not actions: break
-                best_action=None; best_value = float('-inf')
-                for action in actions:
-                    value = self.evaluate(current_state, action)
-                    if value > best_value: best_value=value; best_action=action
-                if best_action is not None:
-                     path.append(best_action); current_state = current_state.apply_action(best_action)
-                else: break
-            return path, current_state.score, self.nodes_explored, self.max_depth
-        except Exception as e: print(f"Erro CS search: {e}"); traceback.print_exc(); return [],0,0,0
+        return self.cascade_values(board.size, [board.occupancy])[0]
+    def cascade_values(self, size, occupancies, grids=None, counts=None):
+        weights = self.weights
+        return batch_cascade_potential(size, occupancies, grids, counts, weights.near_threshold,
+                                       weights.near_line, weights.diagonal, weights.group_exponent)
+    def evaluate_placements(self, state, batch):
+        size = batch.size; occupancies = batch.occupancies; weights = self.weights
+        grids = occupancy_grids(size, occupancies); counts = line_fill_counts(size, occupancies, grids)
+        gains = batch.scores - state.score
+        cascade_potential = self.cascade_values(size, occupancies, grids, counts)
+        elim_bonus = np.where(gains > 0, gains*weights.clear_bonus, 0)
+        return gains*weights.gain + cascade_potential*weights.cascade + elim_bonus + batch_empty_cells(size, counts)*weights.empty
+
+class LearnedEvaluator:
+    """
+    Função de valor aprendida (ver train_value_model.py): prevê os pontos que
+    ainda se vão ganhar a partir de um tabuleiro, com um modelo linear ou um
+    MLP pequeno (ReLU) sobre board_features. A inferência é só NumPy: um lote
+    de tabuleiros é avaliado com uma multiplicação de matrizes por camada.
+
+    Os modelos são guardados em .npz: tamanho do tabuleiro, média e desvio das
+    features e do alvo (normalização) e os pesos w0, b0, w1, b1, ... de cada
+    camada. Cada modelo serve só para o tamanho em que foi treinado.
+    """
+    def __init__(self, size, layers, feature_mean, feature_std, target_mean=0.0, target_std=1.0, horizon=None):
+        if len(feature_mean) != len(BOARD_FEATURES):
+            raise ValueError(f"O modelo tem {len(feature_mean)} features e board_features dá {len(BOARD_FEATURES)}")
+        self.size = size
+        self.layers = [(np.asarray(w, dtype=float), np.asarray(b, dtype=float)) for w, b in layers]
+        self.feature_mean = np.asarray(feature_mean, dtype=float)
+        self.feature_std = np.asarray(feature_std, dtype=float)
+        self.target_mean = float(target_mean); self.target_std = float(target_std)
+        self.horizon = horizon # Jogadas para a frente a que o alvo se refere (só informativo)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            layers = []
+            while f"w{len(layers)}" in data:
+                layers.append((data[f"w{len(layers)}"], data[f"b{len(layers)}"]))
+            horizon = int(data["horizon"]) if "horizon" in data else None
+            return cls(int(data["size"]), layers, data["feature_mean"], data["feature_std"],
+                       float(data["target_mean"]), float(data["target_std"]), horizon)
+
+    def save(self, path):
+        arrays = {"size": self.size, "feature_mean": self.feature_mean, "feature_std": self.feature_std,
+                  "target_mean": self.target_mean, "target_std": self.target_std}
+        if self.horizon is not None: arrays["horizon"] = self.horizon
+        for i, (w, b) in enumerate(self.layers):
+            arrays[f"w{i}"] = w; arrays[f"b{i}"] = b
+        np.savez(path, **arrays)
+
+    def forward(self, features):
+        """ Saída do modelo (já na escala do alvo) para uma matriz de features. """
+        x = (features - self.feature_mean) / self.feature_std
+        for w, b in self.layers[:-1]:
+            x = np.maximum(x @ w + b, 0.0)
+        w, b = self.layers[-1]
+        return (x @ w + b).reshape(-1) * self.target_std + self.target_mean
+
+    def predict(self, occupancies, grids=None, counts=None):
+        """ Pontos previstos para cada bitboard do lote (tabuleiros de self.size). """
+        return self.forward(board_features(self.size, occupancies, grids, counts))
+
+# Modelo de cada tamanho usado por LearnedSearch; a variável de ambiente
+# WOODBLOCK_VALUE_MODEL substitui o caminho (com {size} no lugar do tamanho)
+VALUE_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "modelo_valor_{size}.npz")
+
+class LearnedSearch(BeamSearch):
+    """
+    Beam search com a função de valor aprendida: cada jogada vale os pontos
+    que ganha + os que o modelo prevê a partir do tabuleiro em que deixa o jogo.
+    O modelo pode ser dado (LearnedEvaluator ou caminho de um .npz); senão, o
+    de cada tamanho é lido de VALUE_MODEL_PATH na primeira busca com ele.
+    """
+    DEFAULT_WEIGHTS = {"gain": 1, "future": 1}
+    def __init__(self, beam_width=1, weights=None, model=None):
+        super().__init__(beam_width, weights)
+        if isinstance(model, str): model = LearnedEvaluator.load(model)
+        self.models = {} if model is None else {model.size: model}
+    def model_for(self, size):
+        model = self.models.get(size)
+        if model is None:
+            path = os.environ.get("WOODBLOCK_VALUE_MODEL", VALUE_MODEL_PATH).format(size=size)
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Não há modelo de valor para {size}x{size}: {path} (ver train_value_model.py)")
+            model = self.models[size] = LearnedEvaluator.load(path)
+        if model.size != size:
+            raise ValueError(f"O modelo de valor é de {model.size}x{model.size}, não de {size}x{size}")
+        return model
+    def evaluate_placements(self, state, batch):
+        future = self.model_for(batch.size).predict(batch.occupancies)
+        return (batch.scores - state.score) * self.weights.gain + future * self.weights.future
+
+class ExpectimaxSearch(SearchAlgorithm):
+    """
+    Expectimax sobre a distribuição das peças. Os nós de decisão escolhem a
+    melhor jogada; os nós de acaso fazem a média sobre a peça que substitui a
+    usada (uniforme entre as NUM_BASE_SHAPES formas de base, como em
+    Piece.generate_random_shape), em vez de fixar uma peça sorteada.
+
+    Valores relativos à pontuação da raiz: pontos ganhos + potencial das
+    linhas quase completas na folha (o mesmo do GreedySearch). O valor de um
+    nó está sempre entre L = pontos já ganhos (o potencial nunca é negativo)
+    e U = ganhos + Board.max_clear_points + o máximo que o potencial pode
+    subir, o que permite cortar nós de acaso:
+      - Star1: depois de avaliar parte das peças, se mesmo com L/U nas
+        restantes a média já não pode entrar na janela (alpha, beta), corta;
+      - Star2: antes disso, sonda um limite inferior de cada resultado (a
+        melhor jogada com as peças que não mudam, que é igual para todos)
+        e corta logo se esse limite já chega a beta.
+
+    Busca em profundidade iterativa (até max_depth, ou até o orçamento acabar)
+    com orçamento de nós (colocações avaliadas) e/ou deadline. Trabalha
+    diretamente com bitboards e shape_ids; as avaliações de folha e as
+    melhores jogadas por (ocupação, forma) ficam em cache, porque se repetem
+    em todos os ramos de um nó de acaso. As caches só dependem da ocupação
+    (e do tamanho e dificuldade do tabuleiro), por isso passam de uma decisão
+    para a seguinte: ao refazer um plano, grande parte da árvore já está
+    avaliada. São esvaziadas ao passar de CACHE_LIMIT entradas.
+    """
+    DEFAULT_WEIGHTS = {"line": 50} # Potencial das linhas no valor das folhas
+    MAX_DEPTH = 10 # Profundidade máxima do aprofundamento iterativo quando max_depth não é dado
+    DEFAULT_NODE_BUDGET = 20000
+    CACHE_LIMIT = 1 << 18
+
+    def __init__(self, weights=None):
+        self.weights = HeuristicWeights(self.DEFAULT_WEIGHTS, weights)
+        self.nodes_explored = 0; self.max_depth = 0; self.nodes_pruned = 0
+        self._cache_board = None; self._leaf_cache = {}; self._best_cache = {}
+
+    def search(self, initial_state, max_depth=None, node_budget=None, deadline=None):
+        self._start_search(initial_state, deadline, node_budget)
+        self.nodes_pruned = 0
+        if max_depth is None: max_depth = self.MAX_DEPTH
+        board = initial_state.board
+        self._board = board
+        self._size = board.size
+        # Os pontos de cada jogada dependem do tamanho e da dificuldade
+        if (self._cache_board != (board.size, board.difficulty)
+                or len(self._leaf_cache) + len(self._best_cache) > self.CACHE_LIMIT):
+            self._cache_board = (board.size, board.difficulty)
+            self._leaf_cache = {}; self._best_cache = {}
+        pieces = tuple(piece.shape_id if piece is not None else None
+                       for piece in initial_state.available_pieces)
+
+        best_action = None; best_value = 0
+        for depth in range(1, max_depth + 1):
+            self._out_of_budget = False
+            value, action = self._search_root(board.occupancy, pieces, depth)
+            if action is None: break # Sem jogadas, ou orçamento esgotado antes da primeira
+            best_action, best_value = action, value
+            self.max_depth = depth
+            self._best = ([best_action + (pieces[best_action[0]],)], initial_state.score + best_value)
+            if self._out_of_budget: break
+
+        plan, score = self._best
+        return plan, score, self.nodes_explored, self.max_depth
+
+    def _search_root(self, occupancy, pieces, depth):
+        """
+        Nó de decisão da raiz. Se o orçamento acabar a meio, usa só as jogadas
+        avaliadas por completo nesta iteração (a primeira é a melhor da ordem).
+        """
+        children = self._children(occupancy, 0, pieces)
+        if depth == 1:
+            # A ordem dos filhos já é o valor a profundidade 1
+            children = children[:1]
+        best_value = float("-inf"); best_action = None
+        for immediate_value, slot, anchor, new_occupancy, gain in children:
+            if depth == 1:
+                value = immediate_value
+            else:
+                value = self._chance(new_occupancy, gain, pieces, slot, depth - 1, best_value, float("inf"))
+                if self._out_of_budget: break
+            if value > best_value:
+                row, col = get_placement_table(self._size, pieces[slot]).anchors[anchor]
+                best_value = value; best_action = (slot, 0, row, col)
+        return best_value, best_action
+
+    def _children(self, occupancy, gain, pieces):
+        """
+        Todas as colocações das peças, ordenadas pelo valor imediato (melhor primeiro).
+        Devolve tuplos (valor, posição da peça, âncora, nova ocupação, ganho).
+        """
+        children = []
+        for slot, shape_id in enumerate(pieces):
+            # Peças repetidas geram exatamente as mesmas jogadas
+            if shape_id is None or pieces.index(shape_id) != slot: continue
+            for anchor, new_occupancy, points in self._placements(occupancy, shape_id):
+                children.append((gain + points + self._leaf(new_occupancy), slot, anchor, new_occupancy, gain + points))
+        children.sort(key=lambda child: child[0], reverse=True)
+        return children
+
+    def _placements(self, occupancy, shape_id):
+        """ Colocações legais de uma forma: (âncora, ocupação depois de limpar, pontos). """
+        table = get_placement_table(self._size, shape_id)
+        placements = []
+        for anchor in iter_bits(table.scan(occupancy)):
+            new_occupancy = occupancy | table.masks[anchor]
+            rows, cols, cleared_mask = find_full_lines(self._size, new_occupancy)
+            placements.append((anchor, new_occupancy & ~cleared_mask, self._board.clear_points(len(rows) + len(cols))))
+        self.nodes_explored += len(placements)
+        if self.budget_exhausted():
+            self._out_of_budget = True
+        return placements
+
+    def _leaf(self, occupancy):
+        """ Potencial das linhas e colunas quase completas (nunca negativo). """
+        value = self._leaf_cache.get(occupancy)
+        if value is None:
+            value = line_potential(self._size, occupancy) * self.weights.line
+            self._leaf_cache[occupancy] = value
+        return value
+
+    def _best_placement(self, occupancy, shape_id):
+        """ Melhor pontos + potencial ao colocar a forma (None se não cabe). Em cache. """
+        key = (occupancy, shape_id)
+        if key not in self._best_cache:
+            values = [points + self._leaf(new_occupancy)
+                      for _, new_occupancy, points in self._placements(occupancy, shape_id)]
+            self._best_cache[key] = max(values) if values else None
+        return self._best_cache[key]
+
+    def _upper_bound(self, occupancy, gain, placements):
+        """ Valor máximo possível de um nó com 'placements' jogadas pela frente. """
+        return (gain + self._board.max_clear_points(placements, occupancy) + self._leaf(occupancy)
+                + max_potential_gain(self._size, placements, occupancy) * self.weights.line)
+
+    def _decision(self, occupancy, gain, pieces, depth, alpha, beta):
+        """ Nó de decisão (fail-soft): máximo sobre as jogadas. """
+        if depth == 1:
+            # As jogadas levam a folhas: o valor exato sai da cache por forma
+            values = [self._best_placement(occupancy, shape_id) for shape_id in set(pieces) if shape_id is not None]
+            values = [value for value in values if value is not None]
+            return gain + max(values) if values else gain # Sem jogadas: fim do jogo
+        if self._out_of_budget:
+            return gain
+        children = self._children(occupancy, gain, pieces)
+        if not children: return gain
+        best_value = float("-inf")
+        for _, slot, _, new_occupancy, new_gain in children:
+            value = self._chance(new_occupancy, new_gain, pieces, slot, depth - 1, max(alpha, best_value), beta)
+            if value > best_value: best_value = value
+            if best_value >= beta or self._out_of_budget: break
+        return best_value
+
+    def _chance(self, occupancy, gain, pieces, slot, depth, alpha, beta):
+        """
+        Nó de acaso depois de usar a peça em 'slot': média sobre a forma que a
+        substitui, com cortes Star1/Star2. 'depth' é a profundidade dos filhos.
+        """
+        num_outcomes = NUM_BASE_SHAPES
+        lower = gain
+        upper = self._upper_bound(occupancy, gain, depth)
+        if depth == 1:
+            # Star2: as peças que ficam dão um limite inferior comum a todos os resultados
+            others = [self._best_placement(occupancy, shape_id)
+                      for i, shape_id in enumerate(pieces) if i != slot and shape_id is not None]
+            others = [value for value in others if value is not None]
+            if others: lower = gain + max(others)
+        if lower >= beta:
+            self.nodes_pruned += num_outcomes
+            return lower
+        if upper <= alpha:
+            self.nodes_pruned += num_outcomes
+            return upper
+
+        total = 0.0
+        for shape_id in range(num_outcomes):
+            remaining = num_outcomes - shape_id - 1
+            child_pieces = pieces[:slot] + (shape_id,) + pieces[slot + 1:]
+            # Janela do filho: fora dela a média já fica fora de (alpha, beta)
+            child_alpha = max(lower, alpha * num_outcomes - total - upper * remaining)
+            child_beta = min(upper, beta * num_outcomes - total - lower * remaining)
+            total += self._decision(occupancy, gain, child_pieces, depth, child_alpha, child_beta)
+            # Star1
+            if total + upper * remaining <= alpha * num_outcomes:
+                self.nodes_pruned += remaining
+                return (total + upper * remaining) / num_outcomes
+            if total + lower * remaining >= beta * num_outcomes:
+                self.nodes_pruned += remaining
+                return (total + lower * remaining) / num_outcomes
+            if self._out_of_budget:
+                return (total + lower * remaining) / num_outcomes
+        return total / num_outcomes
+
+class MCTSNode:
+    """
+    Nó de decisão da árvore do MCTS: uma ocupação com as formas disponíveis.
+    As estatísticas são guardadas por ação (visitas, soma dos retornos); o
+    resultado de cada ação depende da peça sorteada para substituir a usada,
+    por isso children[ação] é um dicionário forma sorteada -> nó filho.
+    """
+    __slots__ = ("occupancy", "zobrist", "shapes", "depth", "visits", "untried", "results", "stats", "children")
+
+    def __init__(self, size, occupancy, zobrist, shapes, depth, rng):
+        self.occupancy = occupancy
+        self.zobrist = zobrist
+        self.shapes = shapes
+        self.depth = depth
+        self.visits = 0
+        self.results = {}  # ação -> (ocupação depois de limpar, Zobrist, pontos)
+        self.stats = {}    # ação -> [visitas, soma dos retornos]
+        self.children = {} # ação -> {forma sorteada: MCTSNode}
+        self.untried = []
+        for slot, anchor, new_occupancy, new_zobrist, lines in iter_placements(size, occupancy, shapes, zobrist):
+            row, col = get_placement_table(size, shapes[slot]).anchors[anchor]
+            action = (slot, 0, row, col)
+            self.results[action] = (new_occupancy, new_zobrist, lines)
+            self.untried.append(action)
+        rng.shuffle(self.untried)
+
+    @property
+    def terminal(self): return not self.results
+
+class MCTSSearch(SearchAlgorithm):
+    """
+    Monte Carlo Tree Search (UCT) sobre bitboards. Em cada iteração:
+      1. seleção: desce pela árvore escolhendo a ação com maior UCB1 e
+         sorteando a peça que substitui a usada (uniforme entre as formas de
+         base), como no jogo real;
+      2. expansão: experimenta uma ação ainda não tentada;
+      3. simulação: joga até rollout_depth jogadas com a política de rollout
+         ("greedy": a colocação que limpa mais linhas, desempate aleatório;
+         "random": uma colocação qualquer);
+      4. retropropagação: o retorno é o número de pontos ganhos a partir de
+         cada nó.
+
+    Pára no deadline (ou ao fim de time_limit segundos) ou ao fim de
+    node_budget (max_iterations) iterações, o que vier primeiro, e joga a
+    ação mais visitada da raiz. Sem limites faz DEFAULT_NODE_BUDGET
+    iterações (sem prazo, para a decisão não depender da máquina). A árvore é mantida entre
+    decisões: se o novo estado for um dos filhos da raiz anterior (a ação
+    jogada com a peça que realmente saiu), a busca continua a partir dele.
+    """
+    EXPLORATION = 1.4
+    DEFAULT_NODE_BUDGET = 300
+
+    def __init__(self, rollout_depth=10, rollout_policy="greedy"):
+        if rollout_policy not in ("greedy", "random"):
+            raise ValueError(f"Política de rollout desconhecida: {rollout_policy}")
+        self.nodes_explored = 0; self.max_depth = 0
+        self.rollout_depth = rollout_depth; self.rollout_policy = rollout_policy
+        self.root = None; self.reused_visits = 0
+
+    def search(self, initial_state, time_limit=None, max_iterations=None, deadline=None, node_budget=None):
+        self._start_search(initial_state, deadline, max_iterations if node_budget is None else node_budget, time_limit)
+        self._root_score = initial_state.score
+        board = initial_state.board; self._board = board; self._size = board.size; self._rng = initial_state.rng
+        shapes = tuple(piece.shape_id if piece is not None else None for piece in initial_state.available_pieces)
+
+        root = self._reuse_root(board.occupancy, shapes)
+        if root is None:
+            root = MCTSNode(self._size, board.occupancy, board.zobrist, shapes, 0, self._rng)
+        self.reused_visits = root.visits; self.root = root
+        if root.terminal:
+            return [], initial_state.score, 0, 0
+
+        # nodes_explored conta as iterações
+        while not self.budget_exhausted():
+            self._iterate(root)
+            self.nodes_explored += 1
+
+        plan, score = self.best_plan()
+        return plan, score, self.nodes_explored, self.max_depth
+
+    def best_plan(self):
+        """ A ação mais visitada da raiz (a mais robusta), com o retorno médio. """
+        root = self.root
+        if root is None: return [], None
+        stats = dict(root.stats) # Cópia: a busca pode estar a correr noutra thread
+        best_action = max(stats, key=lambda action: stats[action][0], default=None)
+        if best_action is None or not stats[best_action][0]: return [], self._root_score
+        visits, total = stats[best_action]
+        return [best_action + (root.shapes[best_action[0]],)], self._root_score + total / visits
+
+    def _reuse_root(self, occupancy, shapes):
+        """ Procura o novo estado entre os filhos da raiz da decisão anterior. """
+        if self.root is None: return None
+        for outcomes in self.root.children.values():
+            for child in outcomes.values():
+                if child.occupancy == occupancy and child.shapes == shapes:
+                    child.depth = 0; self._reset_depths(child)
+                    return child
+        return None
+
+    def _reset_depths(self, node):
+        for outcomes in node.children.values():
+            for child in outcomes.values():
+                child.depth = node.depth + 1; self._reset_depths(child)
+
+    def _step(self, node, action):
+        """ Aplica a ação com uma peça sorteada; devolve (filho, pontos), criando o filho se for novo. """
+        new_occupancy, new_zobrist, lines = node.results[action]
+        new_shape = self._rng.randrange(NUM_BASE_SHAPES)
+        outcomes = node.children.setdefault(action, {})
+        child = outcomes.get(new_shape)
+        if child is None:
+            slot = action[0]
+            child = MCTSNode(self._size, new_occupancy, new_zobrist,
+                             node.shapes[:slot] + (new_shape,) + node.shapes[slot + 1:], node.depth + 1, self._rng)
+            outcomes[new_shape] = child
+            self.max_depth = max(self.max_depth, child.depth)
+        return child, self._board.clear_points(lines)
+
+    def _iterate(self, root):
+        node = root; path = [] # (nó, ação, pontos ganhos nessa ação)
+        while not node.terminal:
+            if node.untried:
+                action = node.untried.pop()
+                node.stats[action] = [0, 0.0]
+                child, points = self._step(node, action)
+                path.append((node, action, points)); node = child
+                break
+            action = self._select(node)
+            child, points = self._step(node, action)
+            path.append((node, action, points)); node = child
+
+        # Retorno a partir de cada nó = pontos do resto do caminho + rollout
+        value = self._rollout(node.occupancy, node.shapes)
+        for parent, action, points in reversed(path):
+            value += points
+            parent.visits += 1
+            stats = parent.stats[action]; stats[0] += 1; stats[1] += value
+
+    def _select(self, node):
+        """ UCB1, com os valores médios normalizados pelo melhor valor médio do nó. """
+        log_visits = np.log(node.visits)
+        scale = max(1.0, max(total / visits for visits, total in node.stats.values()))
+        best_action = None; best_ucb = float("-inf")
+        for action, (visits, total) in node.stats.items():
+            ucb = total / visits / scale + self.EXPLORATION * (log_visits / visits) ** 0.5
+            if ucb > best_ucb: best_ucb = ucb; best_action = action
+        return best_action
+
+    def _rollout(self, occupancy, shapes):
+        """ Simulação rápida a partir de (ocupação, formas); devolve os pontos ganhos. """
+        size = self._size; rng = self._rng; points = 0
+        for _ in range(self.rollout_depth):
+            if self.rollout_policy == "random":
+                # Uma forma ao acaso entre as que cabem, numa âncora ao acaso
+                options = [(slot, legal) for slot, shape_id in enumerate(shapes) if shape_id is not None
+                           for legal in [get_placement_table(size, shape_id).scan(occupancy)] if legal]
+                if not options: break
+                slot, legal = rng.choice(options)
+                anchor = rng.choice(list(iter_bits(legal)))
+                table = get_placement_table(size, shapes[slot])
+                rows, cols, cleared_mask = find_full_lines(size, occupancy | table.masks[anchor])
+                occupancy = (occupancy | table.masks[anchor]) & ~cleared_mask; lines = len(rows) + len(cols)
+            else:
+                best = []; best_lines = -1
+                for slot, anchor, new_occupancy, _, lines in iter_placements(size, occupancy, shapes):
+                    if lines > best_lines: best = [(slot, new_occupancy)]; best_lines = lines
+                    elif lines == best_lines: best.append((slot, new_occupancy))
+                if not best: break
+                slot, occupancy = rng.choice(best); lines = best_lines
+            points += self._board.clear_points(lines)
+            shapes = shapes[:slot] + (rng.randrange(NUM_BASE_SHAPES),) + shapes[slot + 1:]
+        return points
+
+#######################
+# Busca paralela (processos) #
+#######################
+SEARCHERS = {
+    "astar": AStarSearch,
+    "greedy": GreedySearch,
+    "bfs": BFSSearch,
+    "dfs": DFSSearch,
+    "dynamic_stability": DynamicStabilitySearch,
+    "cascade": CascadeSearch,
+    "expectimax": ExpectimaxSearch,
+    "mcts": MCTSSearch,
+    "learned": LearnedSearch,
+}
+
+_SEARCH_POOLS = {}    # número de processos -> multiprocessing.Pool
+_WORKER_SEARCHERS = {} # (algoritmo, pesos) -> instância, dentro de cada processo do pool
+
+def _init_search_worker():
+    # Com fork, os processos herdam os handlers de sinais do SDL (que apanha o
+    # SIGTERM para gerar um evento QUIT) e o pool.terminate() ficava à espera deles
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # Ctrl+C é tratado pelo processo principal
+
+def get_search_pool(workers):
+    """ Devolve (criando uma única vez) o pool de processos da busca paralela. """
+    pool = _SEARCH_POOLS.get(workers)
+    if pool is None:
+        pool = multiprocessing.Pool(processes=workers, initializer=_init_search_worker)
+        _SEARCH_POOLS[workers] = pool
+    return pool
+
+def shutdown_search_pools(workers=None):
+    """ Termina os pools da busca paralela (só o de 'workers' processos, se indicado). """
+    for key in list(_SEARCH_POOLS) if workers is None else [workers]:
+        pool = _SEARCH_POOLS.pop(key, None)
+        if pool is not None:
+            pool.terminate()
+
+atexit.register(shutdown_search_pools)
+
+def _search_root_actions(task):
+    """
+    Trabalho de um processo do pool: para cada ação da raiz que lhe coube,
+    aplica-a e procura na subárvore com o algoritmo pedido.
+    """
+    algorithm, weights, method, kwargs, deadline, node_budget, board, pieces, seeds, actions = task
+    key = (algorithm, None if weights is None else tuple(sorted(weights.items())))
+    searcher = _WORKER_SEARCHERS.get(key)
+    if searcher is None:
+        searcher = SEARCHERS[algorithm]() if weights is None else SEARCHERS[algorithm](weights=weights)
+        _WORKER_SEARCHERS[key] = searcher
+    state = GameState(board, pieces, score=board.score)
+    results = []
+    for i, (seed, action) in enumerate(zip(seeds, actions)):
+        # Um gerador por ação: o resultado não depende de como as ações são repartidas
+        state.rng = board.rng = random.Random(seed)
+        child = state.apply_action(action)
+        action_deadline = None
+        if deadline is not None:
+            # O tempo que falta é repartido pelas ações que faltam
+            now = time.perf_counter()
+            action_deadline = now + max(0.0, deadline - now) / (len(actions) - i)
+        path, score, nodes, depth = getattr(searcher, method)(child, deadline=action_deadline, node_budget=node_budget, **kwargs)
+        results.append((path, score, nodes, depth))
+    return results
+
+class ParallelSearch(SearchAlgorithm):
+    """
+    Paralelismo na raiz: reparte as ações de get_possible_actions() por um
+    pool de processos; cada processo aplica a ação e procura na subárvore com
+    o algoritmo escolhido, com os mesmos parâmetros. node_budget é por ação
+    da raiz; o tempo até ao deadline é repartido pelas ações de cada
+    processo (perf_counter é o mesmo relógio em todos os processos). Os
+    resultados são juntos no mesmo tuplo que search()
+    devolve: o plano é a ação com melhor pontuação seguida do seu plano, os
+    nós são somados e a profundidade é a maior + 1. Como cada processo já
+    começa uma jogada abaixo da raiz, o horizonte (A*) que lhe é pedido é o
+    da busca - 1.
+
+    Não há paralelismo nas folhas: avaliar uma folha custa microssegundos,
+    muito menos do que enviá-la a outro processo.
+    """
+    CHUNKS_PER_WORKER = 4 # Vários lotes por processo equilibram subárvores de tamanhos diferentes
+    POLL_INTERVAL = 0.05 # Segundos entre verificações de request_stop() enquanto os processos trabalham
+
+    def __init__(self, algorithm, workers=None, weights=None):
+        self.algorithm = algorithm
+        self.workers = workers or os.cpu_count() or 1
+        # Pesos da heurística do algoritmo (enviados aos processos como dicionário)
+        self.weights = None if not weights else HeuristicWeights(SEARCHERS[algorithm].DEFAULT_WEIGHTS, weights).as_dict()
+        self.nodes_explored = 0; self.max_depth = 0
+
+    def search(self, initial_state, method="search", deadline=None, node_budget=None, **kwargs):
+        self._start_search(initial_state, deadline, node_budget) # Sem limites, cada processo usa os da sua classe
+        actions = initial_state.get_possible_actions()
+        if not actions:
+            return [], initial_state.score, 0, 0
+        if kwargs.get("horizon") is not None:
+            kwargs = dict(kwargs, horizon=kwargs["horizon"] - 1)
+        seeds = [initial_state.rng.getrandbits(64) for _ in actions]
+        board = initial_state.board.copy()
+        self._root_pieces = list(initial_state.available_pieces)
+        # Com deadline, um lote por processo: cada um reparte o tempo pelas suas ações
+        num_chunks = min(len(actions), self.workers * (1 if deadline is not None else self.CHUNKS_PER_WORKER))
+        tasks = [(self.algorithm, self.weights, method, kwargs, deadline, node_budget, board, list(initial_state.available_pieces),
+                  seeds[i::num_chunks], actions[i::num_chunks]) for i in range(num_chunks)]
+        pool = get_search_pool(self.workers)
+        pending = {i: pool.apply_async(_search_root_actions, (task,)) for i, task in enumerate(tasks)}
+
+        # Os resultados voltam a ficar pela ordem das ações (desempate: a primeira ação)
+        results = [None] * len(actions)
+        while pending:
+            if self.stop_requested:
+                # Os processos não vêem o pedido de paragem: o pool é terminado (e
+                # recriado na próxima busca) para não ficar ocupado com trabalho descartado
+                shutdown_search_pools(self.workers)
+                break
+            for i in [i for i, pending_result in pending.items() if pending_result.ready()]:
+                for j, result in enumerate(pending.pop(i).get()):
+                    results[i + j * num_chunks] = result
+                self._update_best(actions, results)
+            if pending:
+                next(iter(pending.values())).wait(self.POLL_INTERVAL)
+        plan, score = self.best_plan()
+        return plan, score, self.nodes_explored, self.max_depth
+
+    def _update_best(self, actions, results):
+        """ Melhor plano e estatísticas com os resultados que já chegaram. """
+        done = [i for i in range(len(actions)) if results[i] is not None]
+        best_index = max(done, key=lambda i: (results[i][1], -i))
+        path, score, _, _ = results[best_index]
+        self.nodes_explored = len(done) + sum(results[i][2] for i in done)
+        self.max_depth = 1 + max(results[i][3] for i in done)
+        action = actions[best_index]
+        self._best = ([action + (self._root_pieces[action[0]].shape_id,)] + list(path), score)
+
+    def search_horizon(self, initial_state, horizon=3, **kwargs):
+        return self.search(initial_state, method="search_horizon", horizon=horizon, **kwargs)
 
 #######################
 # Classe Button (Botão) #
@@ -828,13 +2612,14 @@ class Button:
 # (Com ajustes de UI e debug prints)
 #######################
 class GamePlay:
-    def __init__(self, board_size, difficulty, game_mode):
+    def __init__(self, board_size, difficulty, game_mode, seed=None):
         print(f"DEBUG: Entrando em GamePlay.__init__ com board_size={board_size}, difficulty={difficulty}") # DEBUG
         self.board_size = board_size
         self.difficulty = difficulty
         self.game_mode = game_mode
+        self.seed = seed
         print("DEBUG: Inicializando Board...") # DEBUG
-        self.board = Board(board_size, difficulty)
+        self.board = Board(board_size, difficulty, rng=random.Random(seed))
         print("DEBUG: Board inicializado.") # DEBUG
 
         # Manter cálculo do cell_size para a GRELHA
@@ -1045,82 +2830,249 @@ class GamePlay:
 
 
 #######################
-# Classe AIGamePlay (Modo IA) #
+# Classe AIPlayer (Jogador IA sem interface) #
 #######################
 
-class AIGamePlay:
-    def __init__(self, board_size, difficulty, algorithm):
+# Nomes dos algoritmos aceites por AIPlayer / AIGamePlay
+AI_ALGORITHMS = list(SEARCHERS)
+
+class AIPlayer:
+    """
+    Jogo controlado pela IA, sem qualquer dependência do pygame.
+    Pode ser usado diretamente em simulações (headless); AIGamePlay
+    acrescenta-lhe a interface gráfica.
+    """
+    def __init__(self, board_size, difficulty, algorithm, seed=None, beam_width=1, search_workers=1,
+                 time_per_move=0.5, node_budget=None, weights=None):
         self.board_size = board_size
         self.difficulty = difficulty
         self.algorithm = algorithm
-        self.board = Board(board_size, difficulty)
-        
-        # Calcular o tamanho das células com base no tamanho do tabuleiro
-        self.cell_size = min(500 // board_size, 60)  # Aumentado para melhor visualização
-        
-        # Calcular a posição do tabuleiro para centralizá-lo
-        self.board_x = (SCREEN_WIDTH - board_size * self.cell_size) // 2
-        self.board_y = 120
-        
-        # Posição das peças disponíveis - Centralizado
-        pieces_width = 3 * (4 * self.cell_size + 20)
-        self.pieces_x = (SCREEN_WIDTH - pieces_width) // 2
-        self.pieces_y = self.board_y + board_size * self.cell_size + 30
-        
-        # Botão de voltar ao menu
-        self.back_button = Button(SCREEN_WIDTH - 120, SCREEN_HEIGHT - 60, 100, 40, "Menu")
-        
+        self.seed = seed
+        self.beam_width = beam_width # Largura do feixe de greedy, dynamic_stability, cascade e learned
+        self.search_workers = search_workers # > 1: ações da raiz repartidas por processos (ParallelSearch)
+
+        # Limites de cada decisão, iguais para todos os algoritmos (ver SearchAlgorithm).
+        # Sem prazo (None ou 0) e sem orçamento, cada algoritmo usa os seus limites por omissão,
+        # que são orçamentos de nós (as decisões são reproduzíveis), exceto o dfs, que também
+        # pára ao fim de 1 s: para o dfs ser reproduzível é preciso dar node_budget.
+        self.time_per_move = time_per_move # Segundos por decisão
+        self.node_budget = node_budget     # Nós por decisão
+
+        # Pesos da heurística (None = os do código original). São validados aqui:
+        # um nome errado não pode cair no algoritmo de recurso de initialize_algorithm.
+        self.weights = None
+        if weights:
+            self.weights = HeuristicWeights(SEARCHERS[algorithm].DEFAULT_WEIGHTS, weights).as_dict()
+
+        # Dois geradores independentes: um para o jogo real (tabuleiro inicial e peças
+        # novas) e outro para as peças imaginárias da busca. Assim, com a mesma seed,
+        # todos os algoritmos recebem exatamente as mesmas peças, e cada decisão
+        # da IA é reproduzível.
+        self.rng = random.Random(seed)
+        self.search_rng = random.Random(None if seed is None else f"search-{seed}")
+        self.board = Board(board_size, difficulty, rng=self.rng)
+
         # Estado do jogo
         self.game_over = False
-        self.running = True
-        self.move_delay = 500  # Atraso entre movimentos em milissegundos
-        self.last_move_time = pygame.time.get_ticks()
-        
+
         # Informações do algoritmo
         self.moves_made = 0
         self.nodes_explored = 0
         self.max_depth = 0
-        
+
+        # Estatísticas acumuladas do jogo (usadas pelas simulações em lote)
+        self.total_nodes_explored = 0
+        self.total_nodes_pruned = 0 # Nós cortados (A* com horizonte, DFS e Expectimax; 0 nos outros)
+        self.max_depth_reached = 0
+        self.decision_times = [] # Tempo (s) de cada chamada a search()
+        self.plan_breaks = 0     # Planos interrompidos porque a peça real não era a que a busca assumiu
+        self.discarded_steps = 0 # Passos descartados nessas interrupções
+        self.max_frontier = 0            # BFS: maior nível guardado numa decisão
+        self.memory_limited_decisions = 0 # BFS: decisões que pararam no limite de memória
+
         # Inicializar o algoritmo de IA
         self.ai_algorithm = self.initialize_algorithm()
-        
+
         # Plano de ações (movimentos) calculado pelo algoritmo
         self.action_plan = []
-        
+
     def initialize_algorithm(self):
         """
         Inicializa o algoritmo de IA com base na seleção do usuário.
         """
         try:
-            if self.algorithm == "astar":
-                return AStarSearch()
-            elif self.algorithm == "greedy":
-                return GreedySearch()
-            elif self.algorithm == "bfs":
-                return BFSSearch()
-            elif self.algorithm == "dfs":
-                return DFSSearch()
-            elif self.algorithm == "dynamic_stability":
-                return DynamicStabilitySearch()
-            elif self.algorithm == "cascade":
-                return CascadeSearch()
-            else:
-                # Fallback para Greedy se algo der errado
-                return GreedySearch()
+            if self.search_workers > 1 and self.algorithm in SEARCHERS:
+                return ParallelSearch(self.algorithm, self.search_workers, self.weights)
+            if self.weights is not None:
+                return SEARCHERS[self.algorithm](weights=self.weights)
+            # Fallback para Greedy se algo der errado
+            return SEARCHERS.get(self.algorithm, GreedySearch)()
         except Exception as e:
             print(f"Erro ao inicializar algoritmo: {e}")
             return GreedySearch()  # Fallback seguro
             
+    def new_search_state(self):
+        """
+        Estado inicial da próxima busca: cópias do tabuleiro e das peças (para
+        evitar modificações indesejadas) e um gerador próprio para a decisão.
+        """
+        return GameState(
+            board=self.board.copy(),
+            available_pieces=[piece.copy() for piece in self.board.available_pieces],
+            rng=random.Random(self.search_rng.getrandbits(64))
+        )
+
+    def compute_plan(self, initial_state):
+        """
+        Executa o algoritmo sobre initial_state e devolve (plano, nós,
+        profundidade, tempo em segundos). Não altera o jogo, por isso pode
+        correr noutra thread enquanto a interface continua a desenhar.
+        """
+        start_time = time.perf_counter()
+        deadline = start_time + self.time_per_move if self.time_per_move else None
+        plan, final_score, nodes, depth = self.ai_algorithm.search(
+            initial_state, deadline=deadline, node_budget=self.node_budget, **self.search_options())
+        return plan, nodes, depth, time.perf_counter() - start_time
+
+    def search_options(self):
+        """ Opções de cada algoritmo que não são limites (esses são comuns a todos). """
+        if self.algorithm == "astar":
+            return {"horizon": 3}
+        if self.algorithm in ("greedy", "dynamic_stability", "cascade", "learned"):
+            return {"beam_width": self.beam_width}
+        return {}
+
+    def apply_plan(self, initial_state, plan, nodes, depth, elapsed):
+        """ Adota o plano devolvido por compute_plan e atualiza as estatísticas. """
+        self.decision_times.append(elapsed)
+        self.nodes_explored = nodes
+        self.max_depth = depth
+        self.total_nodes_explored += nodes
+        self.total_nodes_pruned += getattr(self.ai_algorithm, "nodes_pruned", 0)
+        self.max_depth_reached = max(self.max_depth_reached, depth)
+        if isinstance(self.ai_algorithm, BFSSearch):
+            self.max_frontier = max(self.max_frontier, max(self.ai_algorithm.frontier_sizes))
+            self.memory_limited_decisions += self.ai_algorithm.memory_limited
+
+        # A*, BFS e DFS devolvem um plano vazio quando não encontram nenhum estado
+        # com pontuação maior que a atual; nesse caso a IA ficava parada para sempre.
+        # Joga a primeira ação possível para o jogo avançar.
+        if not plan:
+            possible_actions = initial_state.get_possible_actions()
+            if possible_actions:
+                action = possible_actions[0]
+                plan = [action + (initial_state.available_pieces[action[0]].shape_id,)]
+        self.action_plan = list(plan)
+
+    def next_step_valid(self):
+        """
+        Confirma o próximo passo do plano contra as peças reais: a busca
+        assumiu uma forma em cada passo, e as peças que saem depois de cada
+        jogada podem não ser as que ela imaginou. O passo só vale se a peça
+        real for dessa forma e a colocação continuar legal.
+        """
+        piece_index, rotation, row, col, shape_id = self.action_plan[0]
+        piece = self.board.available_pieces[piece_index]
+        return piece is not None and piece.shape_id == shape_id and self.board.can_place_piece(piece, row, col)
+
+    def drop_invalid_plan(self):
+        """
+        Descarta o resto do plano a partir do primeiro passo que já não vale.
+        O novo plano é calculado a partir do estado real. Só a DFS (melhores
+        jogadas na tabela de transposições), o MCTS (árvore) e o Expectimax
+        (caches) reaproveitam algo da busca anterior; os outros recomeçam do zero.
+        """
+        if self.action_plan and not self.next_step_valid():
+            self.plan_breaks += 1
+            self.discarded_steps += len(self.action_plan)
+            self.action_plan = []
+
+    def play_next_action(self):
+        """ Executa a próxima ação do plano (se houver) e verifica o fim do jogo. """
+        if self.action_plan:
+            # Obter a próxima ação (já confirmada por drop_invalid_plan)
+            piece_index, rotation, row, col, shape_id = self.action_plan.pop(0)
+
+            # Colocar a peça no tabuleiro (sem rotação)
+            piece = self.board.available_pieces[piece_index]
+            if self.board.place_piece(piece, row, col):
+                # Peça colocada com sucesso, gerar nova peça
+                self.board.available_pieces[piece_index] = self.board.generate_new_piece()
+                self.moves_made += 1
+
+        # Verificar game over; se o plano acabou, é recalculado na próxima atualização
+        if self.board.is_game_over():
+            self.game_over = True
+
+    def make_ai_move(self):
+        """
+        Executa um movimento da IA com base no algoritmo selecionado
+        (versão síncrona: calcula o plano, se preciso, na própria chamada).
+        """
+        try:
+            # Se não tiver um plano de ações válido, calcular um novo (na mesma
+            # chamada: um passo inválido não custa uma jogada)
+            self.drop_invalid_plan()
+            if not self.action_plan:
+                initial_state = self.new_search_state()
+                self.ai_algorithm.clear_stop()
+                self.apply_plan(initial_state, *self.compute_plan(initial_state))
+            self.play_next_action()
+        except Exception as e:
+            self.report_move_error(e)
+
+    def report_move_error(self, error):
+        print(f"Erro ao fazer movimento da IA: {error}")
+        traceback.print_exc()
+        # Em caso de erro, limpar o plano para tentar novamente na próxima atualização
+        self.action_plan = []
+
+#######################
+# Classe AIGamePlay (Modo IA) #
+#######################
+
+class AIGamePlay(AIPlayer):
+    def __init__(self, board_size, difficulty, algorithm, seed=None, search_workers=1, time_per_move=0.5):
+        super().__init__(board_size, difficulty, algorithm, seed, search_workers=search_workers,
+                         time_per_move=time_per_move)
+
+        # Calcular o tamanho das células com base no tamanho do tabuleiro
+        self.cell_size = min(500 // board_size, 60)  # Aumentado para melhor visualização
+        
+        # Calcular a posição do tabuleiro para centralizá-lo
+        self.board_x = (SCREEN_WIDTH - board_size * self.cell_size) // 2
+        self.board_y = 120
+        
+        # Posição das peças disponíveis - Centralizado
+        pieces_width = 3 * (4 * self.cell_size + 20)
+        self.pieces_x = (SCREEN_WIDTH - pieces_width) // 2
+        self.pieces_y = self.board_y + board_size * self.cell_size + 30
+        
+        # Botão de voltar ao menu
+        self.back_button = Button(SCREEN_WIDTH - 120, SCREEN_HEIGHT - 60, 100, 40, "Menu")
+        
+        # Controlo do ritmo dos movimentos
+        self.running = True
+        self.move_delay = 500  # Atraso entre movimentos em milissegundos
+        self.last_move_time = pygame.time.get_ticks()
+
+        # Planeamento em segundo plano: compute_plan corre numa thread para o
+        # ciclo de desenho nunca bloquear; update() aplica o plano quando estiver pronto
+        self.planner = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.pending_plan = None  # Future de compute_plan
+        self.pending_state = None # Estado inicial da busca em curso
+        self.thinking_since = 0
+            
     def handle_events(self, event):
-        # Verificar clique no botão de voltar
+        # Verificar clique no botão de voltar (cancela a busca em curso)
         if self.back_button.is_clicked(event):
-            self.running = False
+            self.cancel_planning()
             return "menu"
             
         # Verificar se o jogo acabou
         if self.game_over:
             if event.type == pygame.MOUSEBUTTONDOWN or event.type == pygame.KEYDOWN:
-                self.running = False
+                self.cancel_planning()
                 return "menu"
                 
         return None
@@ -1128,68 +3080,52 @@ class AIGamePlay:
     def update(self, mouse_pos):
         # Atualizar botão de voltar
         self.back_button.update(mouse_pos)
-        
-        # Se o jogo estiver rodando e não tiver acabado, fazer um movimento
+        if not self.running or self.game_over:
+            return
+
         current_time = pygame.time.get_ticks()
-        if self.running and not self.game_over and current_time - self.last_move_time > self.move_delay:
-            self.make_ai_move()
+        if self.pending_plan is not None:
+            # A busca está a correr: só aplica o plano quando terminar
+            if self.pending_plan.done():
+                self.finish_planning()
+                self.last_move_time = current_time
+        elif current_time - self.last_move_time > self.move_delay:
+            self.drop_invalid_plan()
+            if self.action_plan:
+                self.make_ai_move() # Ainda há plano: não precisa de busca
+            else:
+                self.start_planning()
             self.last_move_time = current_time
-            
-    def make_ai_move(self):
-        """
-        Executa um movimento da IA com base no algoritmo selecionado.
-        """
+
+    def start_planning(self):
+        """ Lança compute_plan na thread de planeamento. """
+        self.pending_state = self.new_search_state()
+        # Limpo aqui e não na thread: um cancel_planning() logo a seguir não se perde
+        self.ai_algorithm.clear_stop()
+        self.pending_plan = self.planner.submit(self.compute_plan, self.pending_state)
+        self.thinking_since = pygame.time.get_ticks()
+
+    def finish_planning(self):
+        """ Adota o plano da busca terminada e joga a primeira ação. """
+        future, initial_state = self.pending_plan, self.pending_state
+        self.pending_plan = self.pending_state = None
         try:
-            # Se não tiver um plano de ações, calcular um novo
-            if not self.action_plan:
-                # Criar um estado inicial para o algoritmo
-                initial_state = GameState(
-                    board=self.board.copy(),  # Usar cópia para evitar modificações indesejadas
-                    available_pieces=[piece.copy() for piece in self.board.available_pieces]  # Copiar peças também
-                )
-                
-                # Executar o algoritmo para obter um plano de ações
-                if self.algorithm == "astar":
-                    self.action_plan, final_score, nodes, depth = self.ai_algorithm.search(initial_state, max_iterations=100)
-                elif self.algorithm == "greedy":
-                    self.action_plan, final_score, nodes, depth = self.ai_algorithm.search(initial_state, max_depth=20)
-                elif self.algorithm == "bfs":
-                    self.action_plan, final_score, nodes, depth = self.ai_algorithm.search(initial_state, max_iterations=100)
-                elif self.algorithm == "dfs":
-                    self.action_plan, final_score, nodes, depth = self.ai_algorithm.search(initial_state, max_depth=10)
-                elif self.algorithm == "dynamic_stability":
-                    self.action_plan, final_score, nodes, depth = self.ai_algorithm.search(initial_state, max_depth=5)
-                elif self.algorithm == "cascade":
-                    self.action_plan, final_score, nodes, depth = self.ai_algorithm.search(initial_state, max_depth=5)
-                    
-                # Atualizar estatísticas
-                self.nodes_explored = nodes
-                self.max_depth = depth
-                
-            # Se tiver ações no plano, executar a próxima
-            if self.action_plan:
-                # Obter a próxima ação
-                piece_index, rotation, row, col = self.action_plan.pop(0)
-                
-                # Colocar a peça no tabuleiro (sem rotação)
-                piece = self.board.available_pieces[piece_index]
-                if self.board.place_piece(piece, row, col):
-                    # Peça colocada com sucesso, gerar nova peça
-                    self.board.available_pieces[piece_index] = self.board.generate_new_piece()
-                    self.moves_made += 1
-                    
-            # Se não tiver mais ações ou o jogo acabou, verificar game over
-            if not self.action_plan or self.board.is_game_over():
-                # Recalcular um novo plano se ainda não acabou
-                if not self.board.is_game_over():
-                    self.action_plan = []  # Limpar o plano para recalcular na próxima atualização
-                else:
-                    self.game_over = True
+            self.apply_plan(initial_state, *future.result())
+            self.play_next_action()
         except Exception as e:
-            print(f"Erro ao fazer movimento da IA: {e}")
-            traceback.print_exc()
-            # Em caso de erro, limpar o plano para tentar novamente na próxima atualização
-            self.action_plan = []
+            self.report_move_error(e)
+
+    def cancel_planning(self):
+        """
+        Pára o jogo da IA: pede ao algoritmo que pare a busca em curso (o
+        resultado é descartado) e fecha a thread de planeamento.
+        """
+        self.running = False
+        if self.pending_plan is not None:
+            self.ai_algorithm.request_stop()
+            self.pending_plan.cancel()
+            self.pending_plan = self.pending_state = None
+        self.planner.shutdown(wait=False)
             
     def draw(self, surface):
         # Desenhar o fundo amadeirado
@@ -1221,6 +3157,12 @@ class AIGamePlay:
             True, BLACK
         )
         surface.blit(stats_text, (20, 80))
+
+        # Indicador de busca em curso, com os nós explorados até agora
+        if self.pending_plan is not None:
+            dots = "." * (1 + (pygame.time.get_ticks() - self.thinking_since) // 300 % 3)
+            thinking_text = game_font.render(f"A pensar{dots} {self.ai_algorithm.nodes_explored} nós", True, BLACK)
+            surface.blit(thinking_text, thinking_text.get_rect(topright=(SCREEN_WIDTH - 20, 20)))
         
         # Desenhar mensagem de game over
         if self.game_over:
@@ -1313,7 +3255,11 @@ def draw_wooden_background(surface):
 #######################
 
 class Game:
-    def __init__(self):
+    def __init__(self, seed=None, search_workers=1, time_per_move=0.5):
+        init_pygame()
+        self.seed = seed # Seed dos jogos (None = aleatória)
+        self.search_workers = search_workers # Processos da busca da IA (1 = sem paralelismo)
+        self.time_per_move = time_per_move # Tempo de pensamento da IA por decisão (s)
         self.state = "menu"
         self.best_score = 0
         self.load_best_score()
@@ -1365,7 +3311,9 @@ class Game:
             Button(button_x, mode_start_y + 4 * mode_spacing, button_width, button_height, "DFS"),
             Button(button_x, mode_start_y + 5 * mode_spacing, button_width, button_height, "Estabilidade Dinâmica"),
             Button(button_x, mode_start_y + 6 * mode_spacing, button_width, button_height, "Cascata"),
-            Button(button_x, mode_start_y + 8 * mode_spacing, button_width, button_height, "Voltar") # Ajustar Y se necessário
+            Button(button_x, mode_start_y + 7 * mode_spacing, button_width, button_height, "Expectimax"),
+            Button(button_x, mode_start_y + 8 * mode_spacing, button_width, button_height, "MCTS"),
+            Button(button_x, mode_start_y + 9 * mode_spacing, button_width, button_height, "Voltar") # Ajustar Y se necessário
         ]
 
         # Botões de configurações de som (Usar novos tamanhos e espaçamento)
@@ -1409,6 +3357,8 @@ class Game:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
+                    if isinstance(self.gameplay, AIGamePlay):
+                        self.gameplay.cancel_planning() # Não esperar pela busca em curso
                     
                 # Gerenciamento de cliques nos botões
                 if self.state == "menu":
@@ -1578,16 +3528,25 @@ class Game:
             self.game_mode = "cascade"
             self.state = "game"
             self.start_game()
-        elif self.mode_buttons[7].is_clicked(event):  # Voltar
+        elif self.mode_buttons[7].is_clicked(event):  # Expectimax
+            self.game_mode = "expectimax"
+            self.state = "game"
+            self.start_game()
+        elif self.mode_buttons[8].is_clicked(event):  # MCTS
+            self.game_mode = "mcts"
+            self.state = "game"
+            self.start_game()
+        elif self.mode_buttons[9].is_clicked(event):  # Voltar
             self.state = "difficulty_selection"
             
     def start_game(self):
         # Inicializa o jogo com as configurações selecionadas
         try:
             if self.game_mode == "human":
-                self.gameplay = GamePlay(self.board_size, self.difficulty, self.game_mode)
+                self.gameplay = GamePlay(self.board_size, self.difficulty, self.game_mode, seed=self.seed)
             else:
-                self.gameplay = AIGamePlay(self.board_size, self.difficulty, self.game_mode)
+                self.gameplay = AIGamePlay(self.board_size, self.difficulty, self.game_mode, seed=self.seed,
+                                           search_workers=self.search_workers, time_per_move=self.time_per_move)
         except Exception as e:
             print(f"Erro ao iniciar o jogo: {e}")
             traceback.print_exc()
@@ -1686,13 +3645,27 @@ class Game:
         volume_rect = volume_surface.get_rect(center=(SCREEN_WIDTH // 2, volume_y))
         screen.blit(volume_surface, volume_rect)
 
-# Inicia o jogo
-if __name__ == "__main__":
+def main(argv=None):
+    """ Inicia o jogo com interface gráfica. """
+    parser = argparse.ArgumentParser(description="Woodblock Puzzle")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed dos jogos (mesma seed = mesmo tabuleiro e mesmas peças)")
+    parser.add_argument("--search-workers", type=int, default=1,
+                        help="processos usados pela busca da IA (0 = um por núcleo)")
+    parser.add_argument("--time-per-move", type=float, default=0.5,
+                        help="tempo de pensamento da IA por decisão, em segundos (igual para todos os algoritmos)")
+    args = parser.parse_args(argv)
     try:
-        game = Game()
+        game = Game(seed=args.seed, search_workers=args.search_workers or os.cpu_count() or 1,
+                    time_per_move=args.time_per_move)
         game.run()
     except Exception as e:
         print(f"Erro fatal: {e}")
         traceback.print_exc()
-        pygame.quit()
-        sys.exit(1)
\ No newline at end of file
+        if pygame is not None:
+            pygame.quit()
+        sys.exit(1)
+
+# Inicia o jogo
+if __name__ == "__main__":
+    main()
\ No newline at end of file